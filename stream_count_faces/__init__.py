@@ -0,0 +1,37 @@
+"""
+stream_count_faces - Paquete de conteo de rostros para Transport Monitor
+
+Componentes:
+    VideoStream         - Captura de video no bloqueante (threaded)
+    MotionDetector      - Detección de movimiento por diferenciación de frames
+    LocalBuffer         - Almacenamiento SQLite con patrón Store-and-Forward
+    FaceCounter         - Wrapper de AWS Rekognition con filtrado de calidad
+    FaceTracker         - Deduplicación de pasajeros por similitud de rostros
+    LocationProvider    - Geolocalización via GPS serial con fallback IP
+    PassengerEventStore - Registro de abordajes con geolocalización
+"""
+
+from .camera import VideoStream
+from .motion import MotionDetector
+from .storage import LocalBuffer
+from .detector import BoundingBox, DetectedFace, FaceCounter, extract_face_image
+from .tracker import FaceTracker
+from .geolocation import Location, LocationProvider, PassengerEventStore
+from .pipeline import Pipeline
+
+__version__ = "1.0.0"
+
+__all__ = [
+    "VideoStream",
+    "MotionDetector",
+    "LocalBuffer",
+    "BoundingBox",
+    "DetectedFace",
+    "FaceCounter",
+    "extract_face_image",
+    "FaceTracker",
+    "Location",
+    "LocationProvider",
+    "PassengerEventStore",
+    "Pipeline",
+]
@@ -0,0 +1,38 @@
+"""
+_lazy.py - Importación diferida de dependencias pesadas
+
+cv2 y numpy suman cientos de milisegundos de import en un Raspberry
+Pi, y dominan el arranque de invocaciones cortas del CLI (--help,
+tests que solo importan el paquete). lazy_import retorna un módulo
+que recién se carga en el primer acceso a un atributo, así el costo
+se paga solo en los caminos que realmente procesan frames.
+"""
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Importa un módulo de forma diferida via importlib.util.LazyLoader.
+
+    Args:
+        name: Nombre del módulo (ej. "cv2")
+
+    Returns:
+        Módulo (ya cargado si estaba en sys.modules, diferido si no)
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No se encontró el módulo: {name}")
+
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
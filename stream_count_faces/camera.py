@@ -0,0 +1,174 @@
+"""
+camera.py - Captura de video no bloqueante
+
+VideoStream mantiene un thread dedicado que lee frames de la cámara
+(o archivo de video) continuamente y expone siempre el frame más
+reciente, evitando que el bucle principal se bloquee esperando I/O
+de la cámara. Incluye reconexión automática ante fallas.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Optional, Union
+
+from ._lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+class VideoStream:
+    """
+    Captura de video threaded con reconexión automática.
+
+    El thread de captura lee frames tan rápido como la cámara los
+    entrega y guarda solo el último; read() nunca bloquea.
+    """
+
+    # Segundos a esperar antes de reintentar abrir la cámara
+    RECONNECT_DELAY = 2.0
+
+    def __init__(self, source: Union[int, str] = 0, width: int = 1280, height: int = 720):
+        """
+        Inicializa el stream de video.
+
+        Args:
+            source: Índice de cámara (0, 1, ...) o ruta/URL de video
+            width: Ancho objetivo de captura
+            height: Alto objetivo de captura
+        """
+        self.source = source
+        self.width = width
+        self.height = height
+        self.logger = logging.getLogger(__name__)
+
+        self._capture: Optional[cv2.VideoCapture] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._frame: Optional[np.ndarray] = None
+        self._running = False
+        # Señal de frame nuevo: el consumidor puede esperar sobre el
+        # evento en vez de sondear read() con sleeps ciegos
+        self._frame_ready = threading.Event()
+
+        self._stats = {
+            "frames_captured": 0,
+            "frames_dropped": 0,
+            "reconnections": 0
+        }
+
+    def start(self) -> None:
+        """Inicia el thread de captura."""
+        if self._running:
+            self.logger.warning("VideoStream ya está corriendo")
+            return
+
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+        self.logger.info(f"VideoStream iniciado: source={self.source}")
+
+    def _open_capture(self) -> bool:
+        """
+        Abre (o reabre) el dispositivo de captura.
+
+        Returns:
+            True si la cámara se abrió correctamente
+        """
+        self._capture = cv2.VideoCapture(self.source)
+        if not self._capture.isOpened():
+            return False
+
+        self._capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self._capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        return True
+
+    def _capture_loop(self) -> None:
+        """Bucle del thread de captura: lee frames y guarda el último."""
+        if not self._open_capture():
+            self.logger.error(f"No se pudo abrir la fuente de video: {self.source}")
+            self._running = False
+            return
+
+        while self._running:
+            ok, frame = self._capture.read()
+
+            if not ok or frame is None:
+                self.logger.warning("Lectura de frame fallida, reintentando conexión...")
+                self._capture.release()
+                time.sleep(self.RECONNECT_DELAY)
+                if self._open_capture():
+                    self._stats["reconnections"] += 1
+                    continue
+                self.logger.error("Reconexión fallida, deteniendo captura")
+                break
+
+            with self._lock:
+                if self._frame is not None:
+                    self._stats["frames_dropped"] += 1
+                self._frame = frame
+                self._stats["frames_captured"] += 1
+                # set() bajo el lock: publicar el frame y señalarlo es
+                # atómico respecto a read(), que limpia bajo el mismo
+                # lock solo al vaciar el slot
+                self._frame_ready.set()
+
+        if self._capture is not None:
+            self._capture.release()
+        self._running = False
+        # Despertar a cualquier consumidor bloqueado en wait_for_frame
+        self._frame_ready.set()
+
+    def read(self) -> Optional[np.ndarray]:
+        """
+        Retorna el frame más reciente, o None si no hay frame nuevo.
+
+        Cada frame se entrega una sola vez; llamadas subsecuentes
+        retornan None hasta que el thread capture uno nuevo.
+        """
+        with self._lock:
+            frame = self._frame
+            self._frame = None
+            if frame is not None:
+                self._frame_ready.clear()
+        return frame
+
+    def wait_for_frame(self, timeout: Optional[float] = None) -> bool:
+        """
+        Bloquea hasta que el thread de captura publique un frame nuevo.
+
+        Evita el sondeo con sleeps fijos: el consumidor despierta en
+        cuanto hay frame (o al vencer el timeout) en vez de pagar
+        hasta un período completo de polling de latencia.
+
+        Args:
+            timeout: Segundos máximos a esperar, o None para esperar
+                indefinidamente
+
+        Returns:
+            True si hay un frame disponible para read()
+        """
+        return self._frame_ready.wait(timeout)
+
+    def is_running(self) -> bool:
+        """Retorna True si el thread de captura está activo."""
+        return self._running
+
+    def stop(self) -> None:
+        """Detiene el thread de captura y libera la cámara."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        self.logger.info("VideoStream detenido")
+
+    def get_stats(self) -> dict:
+        """
+        Retorna estadísticas de captura.
+
+        Returns:
+            Diccionario con frames capturados, descartados y reconexiones
+        """
+        return dict(self._stats)
@@ -0,0 +1,275 @@
+"""
+detector.py - Conteo de rostros via AWS Rekognition
+
+FaceCounter envía frames a AWS Rekognition DetectFaces y filtra los
+resultados por calidad: confianza mínima, oclusión y frontalidad.
+En modo dry_run no se hace ninguna llamada a AWS (útil para
+desarrollo y tests sin credenciales).
+"""
+
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+from ._lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+@dataclass
+class BoundingBox:
+    """Caja delimitadora de un rostro en coordenadas de píxeles."""
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+@dataclass
+class DetectedFace:
+    """Rostro detectado con su caja, confianza y pose."""
+    bounding_box: BoundingBox
+    confidence: float
+    yaw: float = 0.0
+    pitch: float = 0.0
+
+
+def extract_face_image(frame: np.ndarray, bounding_box: BoundingBox,
+                       margin: float = 0.2) -> np.ndarray:
+    """
+    Recorta la región del rostro de un frame con un margen extra.
+
+    Args:
+        frame: Frame BGR completo
+        bounding_box: Caja del rostro en píxeles
+        margin: Margen relativo a agregar alrededor de la caja
+
+    Returns:
+        Recorte del rostro (ndarray BGR)
+    """
+    height, width = frame.shape[:2]
+
+    margin_x = int(bounding_box.width * margin)
+    margin_y = int(bounding_box.height * margin)
+
+    x1 = max(0, bounding_box.x - margin_x)
+    y1 = max(0, bounding_box.y - margin_y)
+    x2 = min(width, bounding_box.x + bounding_box.width + margin_x)
+    y2 = min(height, bounding_box.y + bounding_box.height + margin_y)
+
+    return frame[y1:y2, x1:x2]
+
+
+class FaceCounter:
+    """
+    Contador de rostros basado en AWS Rekognition DetectFaces.
+
+    Filtra rostros por confianza mínima, oclusión facial y ángulo
+    de pose (solo rostros aproximadamente frontales cuentan como
+    pasajeros mirando hacia la cámara).
+    """
+
+    # Peticiones concurrentes a Rekognition al procesar lotes
+    BATCH_WORKERS = 8
+
+    def __init__(self, face_confidence_threshold: float = 90,
+                 face_occluded_threshold: float = 80,
+                 frontal_threshold: float = 35,
+                 dry_run: bool = False,
+                 region: str = "us-east-1"):
+        """
+        Inicializa el contador de rostros.
+
+        Args:
+            face_confidence_threshold: Confianza mínima del rostro (0-100)
+            face_occluded_threshold: Confianza mínima de oclusión para descartar (0-100)
+            frontal_threshold: Ángulo máximo de yaw/pitch para rostro frontal
+            dry_run: Si True, no llama a AWS y retorna siempre lista vacía
+            region: Región de AWS Rekognition
+        """
+        self.face_confidence_threshold = face_confidence_threshold
+        self.face_occluded_threshold = face_occluded_threshold
+        self.frontal_threshold = frontal_threshold
+        self.dry_run = dry_run
+        self.region = region
+        self.logger = logging.getLogger(__name__)
+
+        self._client = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if not dry_run:
+            import boto3
+            self._client = boto3.client("rekognition", region_name=region)
+
+        self._stats = {
+            "total_frames_processed": 0,
+            "total_faces_detected": 0,
+            "faces_filtered_out": 0,
+            "skipped_due_to_no_motion": 0,
+            "api_errors": 0
+        }
+
+    def _encode_frame(self, frame: np.ndarray) -> bytes:
+        """
+        Codifica un frame a JPEG para enviarlo a Rekognition.
+
+        Args:
+            frame: Frame BGR
+
+        Returns:
+            Bytes JPEG del frame
+        """
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if not ok:
+            raise ValueError("No se pudo codificar el frame a JPEG")
+        return encoded.tobytes()
+
+    def _passes_quality_filters(self, face_detail: dict) -> bool:
+        """
+        Aplica los filtros de calidad a un rostro de Rekognition.
+
+        Args:
+            face_detail: Entrada de FaceDetails de la respuesta de DetectFaces
+
+        Returns:
+            True si el rostro pasa todos los filtros
+        """
+        if face_detail.get("Confidence", 0) < self.face_confidence_threshold:
+            return False
+
+        occluded = face_detail.get("FaceOccluded", {})
+        if occluded.get("Value") and occluded.get("Confidence", 0) >= self.face_occluded_threshold:
+            return False
+
+        pose = face_detail.get("Pose", {})
+        if abs(pose.get("Yaw", 0)) > self.frontal_threshold:
+            return False
+        if abs(pose.get("Pitch", 0)) > self.frontal_threshold:
+            return False
+
+        return True
+
+    def _to_detected_face(self, face_detail: dict, frame_shape: tuple) -> DetectedFace:
+        """
+        Convierte un FaceDetail de Rekognition a DetectedFace en píxeles.
+
+        Args:
+            face_detail: Entrada de FaceDetails
+            frame_shape: Shape del frame original (alto, ancho, ...)
+
+        Returns:
+            DetectedFace con coordenadas absolutas
+        """
+        height, width = frame_shape[:2]
+        box = face_detail["BoundingBox"]
+        pose = face_detail.get("Pose", {})
+
+        return DetectedFace(
+            bounding_box=BoundingBox(
+                x=int(box["Left"] * width),
+                y=int(box["Top"] * height),
+                width=int(box["Width"] * width),
+                height=int(box["Height"] * height)
+            ),
+            confidence=face_detail.get("Confidence", 0),
+            yaw=pose.get("Yaw", 0.0),
+            pitch=pose.get("Pitch", 0.0)
+        )
+
+    def _detect_single(self, frame: np.ndarray) -> List[DetectedFace]:
+        """
+        Detecta y filtra rostros en un frame (una llamada a Rekognition).
+
+        Args:
+            frame: Frame BGR a analizar
+
+        Returns:
+            Lista de rostros que pasan los filtros de calidad
+        """
+        try:
+            response = self._client.detect_faces(
+                Image={"Bytes": self._encode_frame(frame)},
+                Attributes=["DEFAULT", "FACE_OCCLUDED"]
+            )
+        except Exception as e:
+            self._stats["api_errors"] += 1
+            self.logger.error(f"Error en llamada a Rekognition: {e}")
+            return []
+
+        faces = []
+        for face_detail in response.get("FaceDetails", []):
+            if self._passes_quality_filters(face_detail):
+                faces.append(self._to_detected_face(face_detail, frame.shape))
+            else:
+                self._stats["faces_filtered_out"] += 1
+
+        return faces
+
+    def count_faces_batch(self, frames: List[np.ndarray]) -> List[List[DetectedFace]]:
+        """
+        Detecta rostros en un lote de frames.
+
+        Rekognition no acepta lotes en una sola petición, así que las
+        llamadas del lote se despachan en paralelo con un pool de
+        threads: los clientes de boto3 son thread-safe y las peticiones
+        HTTPS se solapan en vez de serializarse.
+
+        Args:
+            frames: Lista de frames BGR a analizar
+
+        Returns:
+            Lista de resultados por frame, en el mismo orden que frames
+        """
+        self._stats["total_frames_processed"] += len(frames)
+
+        if self.dry_run or not frames:
+            return [[] for _ in frames]
+
+        if len(frames) == 1:
+            results = [self._detect_single(frames[0])]
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.BATCH_WORKERS)
+            results = list(self._executor.map(self._detect_single, frames))
+
+        self._stats["total_faces_detected"] += sum(len(faces) for faces in results)
+        return results
+
+    def count_faces(self, frame: np.ndarray,
+                    motion: Optional[bool] = None) -> List[DetectedFace]:
+        """
+        Detecta y filtra rostros en un frame.
+
+        Wrapper de un elemento sobre count_faces_batch(). Si el caller
+        ya corrió el gate de movimiento, pasar su resultado en motion:
+        con motion=False se retorna de inmediato sin codificar ni
+        llamar a Rekognition (sin movimiento no hay rostros nuevos).
+
+        Args:
+            frame: Frame BGR a analizar
+            motion: Resultado del detector de movimiento, o None si
+                no se conoce (se analiza el frame completo)
+
+        Returns:
+            Lista de rostros que pasan los filtros de calidad
+            (vacía en dry_run)
+        """
+        if motion is False:
+            self._stats["total_frames_processed"] += 1
+            self._stats["skipped_due_to_no_motion"] += 1
+            return []
+        return self.count_faces_batch([frame])[0]
+
+    def get_stats(self) -> dict:
+        """
+        Retorna estadísticas de detección.
+
+        Returns:
+            Diccionario con frames procesados, rostros detectados y modo
+        """
+        stats = dict(self._stats)
+        stats["dry_run"] = self.dry_run
+        return stats
@@ -0,0 +1,412 @@
+"""
+geolocation.py - Geolocalización y registro de abordajes
+
+LocationProvider obtiene la posición del vehículo desde un módulo
+GPS serial (NMEA) con fallback a geolocalización por IP cuando no
+hay GPS disponible. PassengerEventStore registra cada abordaje de
+pasajero con su ubicación en SQLite para análisis posterior de
+paradas y demanda.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from .storage import apply_sqlite_pragmas
+
+
+# Precisión estimada (metros) por fuente de ubicación
+GPS_ACCURACY_M = 10.0
+IP_ACCURACY_M = 50000.0
+
+IP_GEOLOCATION_URL = "http://ip-api.com/json/"
+
+
+@dataclass
+class Location:
+    """Ubicación geográfica con su fuente y precisión estimada."""
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    source: str = "none"
+    accuracy: Optional[float] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+class LocationProvider:
+    """
+    Proveedor de ubicación con GPS serial y fallback por IP.
+
+    Orden de resolución: GPS (si hay puerto serial configurado),
+    geolocalización por IP (si está habilitada), última ubicación
+    conocida, y finalmente una Location vacía con source="none".
+    """
+
+    def __init__(self, serial_port: Optional[str] = None,
+                 use_ip_fallback: bool = True,
+                 ttl_seconds: float = 30.0):
+        """
+        Inicializa el proveedor de ubicación.
+
+        Args:
+            serial_port: Puerto del módulo GPS (ej. "/dev/ttyUSB0") o None
+            use_ip_fallback: Usar geolocalización por IP si no hay GPS
+            ttl_seconds: Segundos durante los que una ubicación resuelta
+                se sirve desde cache sin repetir la consulta GPS/IP
+        """
+        self.serial_port = serial_port
+        self.use_ip_fallback = use_ip_fallback
+        self.ttl_seconds = ttl_seconds
+        self.logger = logging.getLogger(__name__)
+
+        self._serial = None
+        self._cached_location: Optional[Location] = None
+        # Momento (monotónico) en que se resolvió la ubicación cacheada
+        self._cached_at: Optional[float] = None
+
+        self._stats = {
+            "gps_reads": 0,
+            "ip_lookups": 0,
+            "cache_hits": 0,
+            "failures": 0
+        }
+
+        if serial_port:
+            self._open_gps(serial_port)
+
+    def _open_gps(self, port: str) -> None:
+        """Abre el puerto serial del módulo GPS."""
+        try:
+            import serial
+            self._serial = serial.Serial(port, baudrate=9600, timeout=1.0)
+            self.logger.info(f"GPS serial abierto: {port}")
+        except Exception as e:
+            self.logger.warning(f"No se pudo abrir GPS en {port}: {e}")
+            self._serial = None
+
+    @staticmethod
+    def _parse_nmea_coord(value: str, direction: str) -> Optional[float]:
+        """
+        Convierte una coordenada NMEA (ddmm.mmmm) a grados decimales.
+
+        Args:
+            value: Coordenada en formato NMEA
+            direction: Hemisferio (N/S/E/W)
+
+        Returns:
+            Grados decimales con signo, o None si el valor es inválido
+        """
+        if not value:
+            return None
+        try:
+            raw = float(value)
+        except ValueError:
+            return None
+
+        degrees = int(raw / 100)
+        minutes = raw - degrees * 100
+        decimal = degrees + minutes / 60.0
+
+        if direction in ("S", "W"):
+            decimal = -decimal
+        return decimal
+
+    def _read_gps(self) -> Optional[Location]:
+        """
+        Lee una sentencia GPGGA/GPRMC del GPS y la convierte a Location.
+
+        Returns:
+            Location con source="gps", o None si no hay fix
+        """
+        if self._serial is None:
+            return None
+
+        try:
+            for _ in range(10):
+                line = self._serial.readline().decode("ascii", errors="ignore").strip()
+                if not line.startswith(("$GPGGA", "$GNGGA")):
+                    continue
+
+                fields = line.split(",")
+                if len(fields) < 7 or fields[6] == "0":
+                    continue  # Sin fix
+
+                latitude = self._parse_nmea_coord(fields[2], fields[3])
+                longitude = self._parse_nmea_coord(fields[4], fields[5])
+                if latitude is None or longitude is None:
+                    continue
+
+                self._stats["gps_reads"] += 1
+                return Location(
+                    latitude=latitude,
+                    longitude=longitude,
+                    source="gps",
+                    accuracy=GPS_ACCURACY_M
+                )
+        except Exception as e:
+            self.logger.warning(f"Error leyendo GPS: {e}")
+
+        return None
+
+    def _lookup_ip(self) -> Optional[Location]:
+        """
+        Geolocaliza por IP pública usando un servicio externo.
+
+        Returns:
+            Location con source="ip", o None si falla la consulta
+        """
+        try:
+            import requests
+            response = requests.get(IP_GEOLOCATION_URL, timeout=3.0)
+            data = response.json()
+            if data.get("status") != "success":
+                return None
+
+            self._stats["ip_lookups"] += 1
+            return Location(
+                latitude=data.get("lat"),
+                longitude=data.get("lon"),
+                source="ip",
+                accuracy=IP_ACCURACY_M
+            )
+        except Exception as e:
+            self.logger.debug(f"Fallback IP no disponible: {e}")
+            return None
+
+    def get_location(self) -> Location:
+        """
+        Obtiene la ubicación actual del vehículo.
+
+        Una ubicación resuelta dentro del TTL se retorna desde cache
+        sin tocar el GPS ni la red: a escala de un bus en ruta la
+        posición no cambia significativamente en segundos, y esto
+        convierte la llamada por pasajero en un lookup en memoria.
+
+        Returns:
+            Location de la mejor fuente disponible; si ninguna responde,
+            retorna la última conocida o una Location con source="none"
+        """
+        now = time.monotonic()
+        if (self._cached_location is not None and self._cached_at is not None
+                and now - self._cached_at < self.ttl_seconds):
+            self._stats["cache_hits"] += 1
+            return self._cached_location
+
+        location = self._read_gps()
+
+        if location is None and self.use_ip_fallback:
+            location = self._lookup_ip()
+
+        if location is None:
+            self._stats["failures"] += 1
+            if self._cached_location is not None:
+                return self._cached_location
+            return Location()
+
+        self._cached_location = location
+        self._cached_at = now
+        return location
+
+    def get_stats(self) -> dict:
+        """
+        Retorna estadísticas del proveedor.
+
+        Returns:
+            Diccionario con lecturas GPS, consultas IP y estado del cache
+        """
+        return {
+            "gps_available": self._serial is not None,
+            "ip_fallback_enabled": self.use_ip_fallback,
+            "cached_location": self._cached_location,
+            "gps_reads": self._stats["gps_reads"],
+            "ip_lookups": self._stats["ip_lookups"],
+            "failures": self._stats["failures"]
+        }
+
+    def close(self) -> None:
+        """Cierra el puerto serial del GPS si está abierto."""
+        if self._serial is not None:
+            self._serial.close()
+            self._serial = None
+
+
+class PassengerEventStore:
+    """
+    Registro SQLite de abordajes de pasajeros con geolocalización.
+
+    Cada abordaje guarda el face_id (si el tracking lo resolvió),
+    la ubicación y su fuente. Permite agregar estadísticas por
+    parada para análisis de demanda.
+    """
+
+    def __init__(self, db_path: str = "data/passenger_events.db"):
+        """
+        Inicializa el almacén y crea el esquema si no existe.
+
+        Args:
+            db_path: Ruta de la base de datos SQLite (":memory:" para tests)
+        """
+        self.db_path = db_path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+        if db_path != ":memory:":
+            db_dir = os.path.dirname(db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        apply_sqlite_pragmas(self.conn, db_path)
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        """Crea la tabla de abordajes."""
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS boardings (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    face_id TEXT,
+                    latitude REAL,
+                    longitude REAL,
+                    location_source TEXT NOT NULL DEFAULT 'none',
+                    location_accuracy REAL,
+                    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_boardings_loc "
+                "ON boardings(latitude, longitude)"
+            )
+
+    def record_boarding(self, face_id: Optional[str] = None,
+                        latitude: Optional[float] = None,
+                        longitude: Optional[float] = None,
+                        location_source: str = "none",
+                        location_accuracy: Optional[float] = None) -> int:
+        """
+        Registra el abordaje de un pasajero.
+
+        Wrapper de conveniencia sobre record_boardings(); para varios
+        pasajeros en el mismo frame preferir la versión bulk que usa
+        una sola transacción.
+
+        Args:
+            face_id: Identificador del rostro (None si tracking deshabilitado)
+            latitude: Latitud del abordaje
+            longitude: Longitud del abordaje
+            location_source: Fuente de la ubicación ("gps", "ip", "none")
+            location_accuracy: Precisión estimada en metros
+
+        Returns:
+            ID del registro insertado
+        """
+        return self.record_boardings([{
+            "face_id": face_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "location_source": location_source,
+            "location_accuracy": location_accuracy
+        }])[0]
+
+    def record_boardings(self, events: List[dict]) -> List[int]:
+        """
+        Registra varios abordajes en una sola transacción.
+
+        Un solo BEGIN/COMMIT con executemany amortiza el fsync entre
+        todos los abordajes del lote (típicamente todos los pasajeros
+        nuevos de un mismo frame).
+
+        Args:
+            events: Lista de diccionarios con las claves de
+                record_boarding (las ausentes toman su default)
+
+        Returns:
+            Lista de IDs insertados, en el mismo orden que events
+        """
+        if not events:
+            return []
+
+        rows = [
+            (
+                event.get("face_id"),
+                event.get("latitude"),
+                event.get("longitude"),
+                event.get("location_source", "none"),
+                event.get("location_accuracy")
+            )
+            for event in events
+        ]
+
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO boardings "
+                "(face_id, latitude, longitude, location_source, location_accuracy) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            last_id = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+        # Los IDs son consecutivos dentro de la transacción (un solo
+        # escritor bajo el lock)
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    def get_location_stats(self, round_digits: int = 4) -> List[dict]:
+        """
+        Agrega los abordajes por ubicación (parada aproximada).
+
+        El GROUP BY corre dentro de SQLite (C compilado) en vez de
+        traer todas las filas y agrupar en Python: una sola sentencia
+        retorna las paradas ya contadas y ordenadas.
+
+        Args:
+            round_digits: Decimales para agrupar coordenadas cercanas
+
+        Returns:
+            Lista de paradas con conteo de pasajeros, ordenada por demanda
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT ROUND(latitude, ?) AS latitude, "
+                "ROUND(longitude, ?) AS longitude, "
+                "COUNT(*) AS passenger_count, "
+                "MIN(created_at) AS first_seen, "
+                "MAX(created_at) AS last_seen "
+                "FROM boardings "
+                "WHERE latitude IS NOT NULL AND longitude IS NOT NULL "
+                "GROUP BY ROUND(latitude, ?), ROUND(longitude, ?) "
+                "ORDER BY passenger_count DESC",
+                (round_digits, round_digits, round_digits, round_digits)
+            ).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def get_stats(self) -> dict:
+        """
+        Retorna estadísticas del almacén.
+
+        Returns:
+            Diccionario con totales de eventos con y sin ubicación
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*) AS total, "
+                "SUM(CASE WHEN latitude IS NOT NULL THEN 1 ELSE 0 END) AS with_loc "
+                "FROM boardings"
+            ).fetchone()
+
+        total = row["total"] or 0
+        with_location = row["with_loc"] or 0
+        return {
+            "total_events": total,
+            "events_with_location": with_location,
+            "events_without_location": total - with_location,
+            "db_path": self.db_path
+        }
+
+    def close(self) -> None:
+        """Cierra la conexión a la base de datos."""
+        self.conn.close()
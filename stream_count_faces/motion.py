@@ -0,0 +1,275 @@
+"""
+motion.py - Detección de movimiento por diferenciación de frames
+
+MotionDetector filtra frames sin actividad comparando cada frame
+contra el anterior. Solo los frames con movimiento significativo
+pasan a la etapa de detección de rostros (que es costosa por las
+llamadas a AWS Rekognition).
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+from ._lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+class MotionDetector:
+    """
+    Detector de movimiento basado en diferenciación de frames.
+
+    Trabaja sobre una versión en escala de grises reducida 4x del
+    frame: convertir y reducir primero corta ~48x los bytes tocados
+    por la comparación, y absdiff/threshold/countNonZero corren en
+    los kernels vectorizados (SSE2/NEON) de OpenCV. El downscale
+    con INTER_AREA promedia bloques 4x4, lo que además suaviza el
+    ruido que antes se atenuaba con desenfoque gaussiano.
+    """
+
+    # Factor de reducción espacial del frame antes de comparar
+    DOWNSCALE = 4
+
+    def __init__(self, min_area: int = 5000, threshold: int = 25,
+                 blur_kernel: int = 21, cooldown_frames: int = 5,
+                 use_opencl: bool = False):
+        """
+        Inicializa el detector de movimiento.
+
+        Args:
+            min_area: Área mínima de cambio para considerar movimiento
+                (en píxeles del frame original)
+            threshold: Umbral de diferencia binaria (0-255)
+            blur_kernel: Tamaño del kernel gaussiano (conservado por
+                compatibilidad; el downscale INTER_AREA ya actúa como
+                filtro pasa-bajos)
+            cooldown_frames: Frames a ignorar después de detectar movimiento
+            use_opencl: Despachar el pipeline vía la T-API (cv2.UMat)
+                al dispositivo OpenCL del SoC si existe; se ignora
+                silenciosamente cuando no hay OpenCL disponible
+        """
+        self.min_area = min_area
+        self.threshold = threshold
+        self.blur_kernel = blur_kernel if blur_kernel % 2 == 1 else blur_kernel + 1
+        self.cooldown_frames = cooldown_frames
+        self.logger = logging.getLogger(__name__)
+
+        # T-API: con UMat, cvtColor/resize/absdiff/threshold despachan
+        # al dispositivo OpenCL con la misma API. Sin OpenCL, UMat solo
+        # agrega overhead de envoltura, así que se cae al camino ndarray
+        self.use_opencl = False
+        if use_opencl:
+            try:
+                if cv2.ocl.haveOpenCL():
+                    cv2.ocl.setUseOpenCL(True)
+                    self.use_opencl = cv2.ocl.useOpenCL()
+            except Exception:
+                self.use_opencl = False
+            if not self.use_opencl:
+                self.logger.warning(
+                    "OpenCL no disponible; detección de movimiento en CPU"
+                )
+
+        # Dos frames anteriores para diferenciación de tres frames:
+        # _prev1 es el más reciente, _prev2 el anterior a ese. Se
+        # inicializan a buffers en cero (nunca None): el camino
+        # caliente no necesita comprobar sentinelas, solo cuántos
+        # frames reales se han visto (_seen_frames)
+        self._prev1: Optional[np.ndarray] = None
+        self._prev2: Optional[np.ndarray] = None
+        self._seen_frames = 0
+        self._cooldown = 0
+        # Caja (x, y, w, h) en píxeles del frame original que encierra
+        # el último movimiento confirmado; None si el último detect()
+        # no disparó
+        self.last_motion_bbox: Optional[tuple] = None
+
+        # Buffers de trabajo pre-asignados (se crean al conocer la
+        # resolución del primer frame); el anillo de 3 frames reducidos
+        # cubre actual/prev1/prev2 sin asignar memoria por llamada
+        self._gray = None
+        self._ring: list = []
+        self._ring_idx = 0
+        self._diff = None
+        self._d1_mask = None
+        self._d2_mask = None
+        # Resolución para la que están asignados los buffers (los UMat
+        # no exponen .shape, así que se lleva aparte)
+        self._buffer_shape: Optional[tuple] = None
+        self._small_shape: Optional[tuple] = None
+
+        self._stats = {
+            "frames_processed": 0,
+            "motion_events": 0,
+            "frames_in_cooldown": 0
+        }
+
+    def _ensure_buffers(self, shape: tuple) -> None:
+        """
+        Asigna los buffers de trabajo para la resolución del frame.
+
+        Solo re-asigna si la resolución cambió; en el caso normal es
+        una comparación de shapes y nada más.
+
+        Args:
+            shape: Shape del frame de entrada (alto, ancho, ...)
+        """
+        height, width = shape[:2]
+        if self._buffer_shape == (height, width):
+            return
+
+        self._buffer_shape = (height, width)
+        small_shape = (height // self.DOWNSCALE, width // self.DOWNSCALE)
+        self._small_shape = small_shape
+        if self.use_opencl:
+            # Los buffers viven en el dispositivo: asignarlos una vez
+            # evita crear UMats (y sus transferencias) por frame
+            self._gray = cv2.UMat(height, width, cv2.CV_8UC1)
+            self._ring = [cv2.UMat(np.zeros(small_shape, np.uint8)) for _ in range(3)]
+            self._diff = cv2.UMat(small_shape[0], small_shape[1], cv2.CV_8UC1)
+            self._d1_mask = cv2.UMat(small_shape[0], small_shape[1], cv2.CV_8UC1)
+            self._d2_mask = cv2.UMat(small_shape[0], small_shape[1], cv2.CV_8UC1)
+        else:
+            self._gray = np.empty((height, width), np.uint8)
+            self._ring = [np.zeros(small_shape, np.uint8) for _ in range(3)]
+            self._diff = np.empty(small_shape, np.uint8)
+            self._d1_mask = np.empty(small_shape, np.uint8)
+            self._d2_mask = np.empty(small_shape, np.uint8)
+        self._ring_idx = 0
+        # prev1/prev2 arrancan como buffers en cero del anillo; el
+        # contador de frames vistos invalida los resultados hasta que
+        # haya historia real (cambio de resolución incluido)
+        self._prev1 = self._ring[2]
+        self._prev2 = self._ring[1]
+        self._seen_frames = 0
+
+    def _preprocess(self, frame: np.ndarray):
+        """
+        Convierte el frame a escala de grises reducida DOWNSCALE veces.
+
+        Escribe sobre los buffers pre-asignados (dst=) para no tocar
+        el allocator en el camino caliente. El buffer retornado sale
+        del anillo de 3: sigue siendo válido mientras rota como
+        prev1/prev2 en las dos llamadas siguientes. Con use_opencl el
+        frame se sube a UMat y el resto del pipeline queda en el
+        dispositivo.
+
+        Args:
+            frame: Frame BGR de entrada
+
+        Returns:
+            Frame en escala de grises reducido (ndarray o UMat)
+        """
+        src = cv2.UMat(frame) if self.use_opencl else frame
+        cv2.cvtColor(src, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        small = self._ring[self._ring_idx]
+        self._ring_idx = (self._ring_idx + 1) % len(self._ring)
+        cv2.resize(self._gray, (self._small_shape[1], self._small_shape[0]),
+                   dst=small, interpolation=cv2.INTER_AREA)
+        return small
+
+    def _shift_frames(self, small: np.ndarray) -> None:
+        """Desplaza la ventana de frames anteriores (prev1 → prev2)."""
+        self._prev2 = self._prev1
+        self._prev1 = small
+
+    def detect(self, frame: np.ndarray) -> bool:
+        """
+        Detecta movimiento por diferenciación de tres frames.
+
+        Compara el frame actual contra el anterior (D2) y, solo si D2
+        supera el área mínima, confirma contra la diferencia de los dos
+        frames previos (D1) para descartar artefactos de un solo frame.
+        En escenas estáticas D2 no dispara y el resto del trabajo se
+        omite por completo. El primer frame establece la referencia y
+        retorna False. No modifica el frame de entrada.
+
+        Args:
+            frame: Frame BGR a analizar
+
+        Returns:
+            True si se detectó movimiento significativo
+        """
+        self._stats["frames_processed"] += 1
+        self.last_motion_bbox = None
+
+        self._ensure_buffers(frame.shape)
+        small = self._preprocess(frame)
+        seen = self._seen_frames
+        self._seen_frames = seen + 1 if seen < 2 else 2
+
+        # Durante el cooldown solo se actualiza la ventana de frames
+        if self._cooldown > 0:
+            self._cooldown -= 1
+            self._stats["frames_in_cooldown"] += 1
+            self._shift_frames(small)
+            return False
+
+        # min_area está en píxeles del frame original; cada píxel
+        # reducido representa DOWNSCALE² píxeles originales
+        min_area_small = self.min_area // (self.DOWNSCALE * self.DOWNSCALE)
+
+        # D2 = |F(k) - F(k-1)|: salida temprana si la escena está
+        # quieta o aún no hay historia (seen == 0 anula el resultado
+        # contra el buffer en cero inicial)
+        cv2.absdiff(small, self._prev1, dst=self._diff)
+        cv2.threshold(self._diff, self.threshold, 255, cv2.THRESH_BINARY,
+                      dst=self._d2_mask)
+        if seen == 0 or cv2.countNonZero(self._d2_mask) < min_area_small:
+            self._shift_frames(small)
+            return False
+
+        # D1 = |F(k-1) - F(k-2)|: confirma contra el par anterior
+        motion_mask = self._d2_mask
+        if seen >= 2:
+            cv2.absdiff(self._prev1, self._prev2, dst=self._diff)
+            cv2.threshold(self._diff, self.threshold, 255, cv2.THRESH_BINARY,
+                          dst=self._d1_mask)
+            if cv2.countNonZero(self._d1_mask) >= min_area_small:
+                # Movimiento sostenido: exigir que D1 y D2 se intersecten
+                # (la intersección reutiliza el buffer de diferencia)
+                overlap = cv2.bitwise_and(self._d1_mask, self._d2_mask, dst=self._diff)
+                if cv2.countNonZero(overlap) < min_area_small:
+                    self._shift_frames(small)
+                    return False
+                motion_mask = overlap
+            # D1 vacío: inicio de movimiento tras escena estática
+
+        # Caja del movimiento, re-escalada a píxeles del frame original
+        x, y, w, h = cv2.boundingRect(motion_mask)
+        scale = self.DOWNSCALE
+        self.last_motion_bbox = (x * scale, y * scale, w * scale, h * scale)
+
+        self._shift_frames(small)
+        self._stats["motion_events"] += 1
+        self._cooldown = self.cooldown_frames
+        return True
+
+    def get_motion_bbox(self) -> Optional[tuple]:
+        """
+        Retorna la caja del último movimiento confirmado.
+
+        Returns:
+            Tupla (x, y, w, h) en píxeles del frame original, o None
+            si el último detect() no disparó
+        """
+        return self.last_motion_bbox
+
+    def reset(self) -> None:
+        """Descarta la historia de frames y reinicia el cooldown."""
+        self._buffer_shape = None  # Fuerza re-inicialización de buffers
+        self._seen_frames = 0
+        self._cooldown = 0
+        self.last_motion_bbox = None
+
+    def get_stats(self) -> dict:
+        """
+        Retorna estadísticas de detección.
+
+        Returns:
+            Diccionario con frames procesados y eventos de movimiento
+        """
+        return dict(self._stats)
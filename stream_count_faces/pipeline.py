@@ -0,0 +1,109 @@
+"""
+pipeline.py - Procesamiento de frames en paralelo
+
+Pipeline solapa la detección de movimiento y el conteo de rostros en
+un pool de threads. OpenCV y boto3 liberan el GIL durante su trabajo
+en C/red, así que un solo caller de Python deja núcleos ociosos: con
+el pipeline, el thread productor puede capturar el frame N+1 mientras
+los workers procesan el frame N.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from ._lazy import lazy_import
+
+np = lazy_import("numpy")
+
+from .detector import DetectedFace, FaceCounter
+from .motion import MotionDetector
+
+
+class Pipeline:
+    """
+    Pipeline de dos etapas (movimiento → rostros) sobre un thread pool.
+
+    El número de frames en vuelo está acotado: cuando todos los slots
+    están ocupados, submit() descarta el frame en vez de acumular una
+    cola de frames viejos. La etapa de movimiento se serializa con un
+    lock (MotionDetector es stateful); el conteo de rostros, que es la
+    etapa lenta, sí corre en paralelo.
+    """
+
+    def __init__(self, motion_detector: MotionDetector,
+                 face_counter: FaceCounter,
+                 max_pending: int = 3):
+        """
+        Inicializa el pipeline.
+
+        Args:
+            motion_detector: Detector de movimiento compartido
+            face_counter: Contador de rostros compartido
+            max_pending: Máximo de frames en vuelo antes de descartar
+        """
+        self.motion_detector = motion_detector
+        self.face_counter = face_counter
+        self.logger = logging.getLogger(__name__)
+
+        self._executor = ThreadPoolExecutor(max_workers=2)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._motion_lock = threading.Lock()
+
+        self._stats = {
+            "frames_submitted": 0,
+            "frames_dropped": 0
+        }
+
+    def _process(self, frame: np.ndarray) -> List[DetectedFace]:
+        """
+        Procesa un frame: gate de movimiento y conteo de rostros.
+
+        Args:
+            frame: Frame BGR a procesar
+
+        Returns:
+            Rostros detectados (vacío si no hubo movimiento)
+        """
+        with self._motion_lock:
+            motion = self.motion_detector.detect(frame)
+        if not motion:
+            return []
+        return self.face_counter.count_faces(frame)
+
+    def submit(self, frame: np.ndarray) -> Optional[Future]:
+        """
+        Encola un frame para procesamiento asíncrono.
+
+        Args:
+            frame: Frame BGR (el caller no debe reutilizar el buffer
+                hasta que el Future resuelva)
+
+        Returns:
+            Future con la lista de rostros, o None si el frame fue
+            descartado por falta de slots
+        """
+        if not self._slots.acquire(blocking=False):
+            self._stats["frames_dropped"] += 1
+            return None
+
+        self._stats["frames_submitted"] += 1
+        future = self._executor.submit(self._process, frame)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def get_stats(self) -> dict:
+        """
+        Retorna estadísticas del pipeline.
+
+        Returns:
+            Diccionario con frames enviados y descartados
+        """
+        return dict(self._stats)
+
+    def shutdown(self) -> None:
+        """Espera los frames en vuelo y cierra el pool."""
+        self._executor.shutdown(wait=True)
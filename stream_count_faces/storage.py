@@ -0,0 +1,300 @@
+"""
+storage.py - Almacenamiento local con patrón Store-and-Forward
+
+LocalBuffer persiste eventos en SQLite para dar resiliencia ante
+fallas de red: los eventos se acumulan localmente marcados como
+pendientes y un proceso de sincronización los marca como enviados
+cuando la conexión se restablece.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import List, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # orjson (C + SIMD) es varias veces más rápido que el json de la
+    # stdlib para los payloads pequeños del camino de eventos
+    def _json_dumps(obj: dict) -> str:
+        return orjson.dumps(obj).decode()
+
+    _json_loads = orjson.loads
+else:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+# UPDATE ... RETURNING requiere SQLite >= 3.35; Raspberry Pi OS
+# Bullseye trae 3.34, así que hay un camino alterno SELECT + UPDATE
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def apply_sqlite_pragmas(conn: sqlite3.Connection, db_path: str,
+                         journal_mode: str = "WAL") -> None:
+    """
+    Aplica los pragmas de rendimiento a una conexión SQLite.
+
+    WAL + synchronous=NORMAL reducen los fsync por transacción,
+    temp_store/mmap_size mueven trabajo a memoria y busy_timeout
+    evita errores inmediatos de "database is locked" entre threads.
+    Para bases en memoria solo aplica el busy_timeout (WAL y mmap
+    no tienen sentido sin archivo).
+
+    Args:
+        conn: Conexión SQLite recién abierta
+        db_path: Ruta de la base (":memory:" se trata aparte)
+        journal_mode: Modo de journal a forzar (normalmente "WAL")
+    """
+    conn.execute("PRAGMA busy_timeout=5000")
+    if db_path == ":memory:":
+        return
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+
+
+class LocalBuffer:
+    """
+    Buffer de eventos SQLite con patrón Store-and-Forward.
+
+    Cada evento tiene un tipo, un payload JSON y una bandera de
+    sincronización. Los inserts se agrupan en una sola transacción
+    via save_events_bulk() para amortizar el costo de fsync; la
+    conexión usa WAL para no bloquear lecturas concurrentes.
+    """
+
+    def __init__(self, db_path: str = "data/transport_events.db",
+                 journal_mode: str = "WAL"):
+        """
+        Inicializa el buffer y crea el esquema si no existe.
+
+        Args:
+            db_path: Ruta de la base de datos SQLite (":memory:" para tests)
+            journal_mode: Modo de journal de SQLite ("WAL" recomendado;
+                se ignora para bases en memoria)
+        """
+        self.db_path = db_path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+        if db_path != ":memory:":
+            db_dir = os.path.dirname(db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+
+        apply_sqlite_pragmas(self.conn, db_path, journal_mode=journal_mode)
+
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        """Crea la tabla de eventos y sus índices."""
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    type TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    synced INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_events_synced ON events(synced)"
+            )
+
+    def save_event(self, event_type: str, payload: dict) -> int:
+        """
+        Guarda un evento individual.
+
+        Wrapper de conveniencia sobre save_events_bulk(); para varios
+        eventos por frame preferir la versión bulk que usa una sola
+        transacción.
+
+        Args:
+            event_type: Tipo de evento (ej. "face_count", "motion")
+            payload: Datos del evento (serializable a JSON)
+
+        Returns:
+            ID del evento insertado
+        """
+        return self.save_events_bulk([(event_type, payload)])[0]
+
+    def save_events_bulk(self, events: List[Tuple[str, dict]]) -> List[int]:
+        """
+        Guarda varios eventos en una sola transacción.
+
+        Un solo BEGIN/COMMIT con executemany amortiza el fsync entre
+        todos los eventos del lote en vez de pagarlo por fila.
+
+        Args:
+            events: Lista de tuplas (tipo, payload)
+
+        Returns:
+            Lista de IDs insertados, en el mismo orden que events
+        """
+        if not events:
+            return []
+
+        rows = [(event_type, _json_dumps(payload)) for event_type, payload in events]
+
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO events (type, payload, synced) VALUES (?, ?, 0)",
+                rows
+            )
+            last_id = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+        # Los IDs son consecutivos dentro de la transacción (tabla con
+        # AUTOINCREMENT y un solo escritor bajo el lock)
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    def pop_pending_events(self, limit: int = 100) -> List[dict]:
+        """
+        Marca eventos pendientes como sincronizados y los retorna.
+
+        Un solo UPDATE ... RETURNING atómico reemplaza el par
+        get_pending_events() + mark_synced(): no hay carrera entre
+        leer y marcar, ni lista de IDs de ida y vuelta por Python.
+        Con SQLite < 3.35 (sin RETURNING) se cae a SELECT + UPDATE
+        dentro de la misma transacción bajo el lock, que sigue siendo
+        atómico para este store de conexión única.
+
+        Args:
+            limit: Máximo de eventos a extraer
+
+        Returns:
+            Lista de diccionarios con id, type y payload, en orden de
+            inserción
+        """
+        with self._lock, self.conn:
+            if _HAS_RETURNING:
+                rows = self.conn.execute(
+                    "UPDATE events SET synced = 1 WHERE id IN "
+                    "(SELECT id FROM events WHERE synced = 0 ORDER BY id LIMIT ?) "
+                    "RETURNING id, type, payload",
+                    (limit,)
+                ).fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT id, type, payload FROM events "
+                    "WHERE synced = 0 ORDER BY id LIMIT ?",
+                    (limit,)
+                ).fetchall()
+                if rows:
+                    self.conn.executemany(
+                        "UPDATE events SET synced = 1 WHERE id = ?",
+                        [(row["id"],) for row in rows]
+                    )
+
+        return [
+            {
+                "id": row["id"],
+                "type": row["type"],
+                "payload": _json_loads(row["payload"])
+            }
+            for row in rows
+        ]
+
+    def get_pending_events(self, limit: int = 100) -> List[dict]:
+        """
+        Obtiene eventos pendientes de sincronizar.
+
+        Obsoleto para el flujo de sincronización: preferir
+        pop_pending_events(), que lee y marca en una sola sentencia.
+
+        Args:
+            limit: Máximo de eventos a retornar
+
+        Returns:
+            Lista de diccionarios con id, type, payload y created_at
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, type, payload, created_at FROM events "
+                "WHERE synced = 0 ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+
+        return [
+            {
+                "id": row["id"],
+                "type": row["type"],
+                "payload": _json_loads(row["payload"]),
+                "created_at": row["created_at"]
+            }
+            for row in rows
+        ]
+
+    def mark_synced(self, event_ids: List[int]) -> None:
+        """
+        Marca eventos como sincronizados.
+
+        Obsoleto para el flujo de sincronización: preferir
+        pop_pending_events(), que lee y marca en una sola sentencia.
+
+        Args:
+            event_ids: Lista de IDs de eventos a marcar
+        """
+        if not event_ids:
+            return
+
+        placeholders = ",".join("?" * len(event_ids))
+        with self._lock, self.conn:
+            self.conn.execute(
+                f"UPDATE events SET synced = 1 WHERE id IN ({placeholders})",
+                event_ids
+            )
+
+    def cleanup_old_events(self, retention_days: int = 30) -> int:
+        """
+        Elimina eventos sincronizados más viejos que la retención.
+
+        Args:
+            retention_days: Días de retención para eventos ya sincronizados
+
+        Returns:
+            Número de eventos eliminados
+        """
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM events WHERE synced = 1 "
+                "AND created_at < datetime('now', ?)",
+                (f"-{retention_days} days",)
+            )
+            return cursor.rowcount
+
+    def get_stats(self) -> dict:
+        """
+        Retorna estadísticas del buffer.
+
+        Returns:
+            Diccionario con eventos pendientes, sincronizados y totales
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT "
+                "SUM(CASE WHEN synced = 0 THEN 1 ELSE 0 END) AS pending, "
+                "SUM(CASE WHEN synced = 1 THEN 1 ELSE 0 END) AS synced, "
+                "COUNT(*) AS total FROM events"
+            ).fetchone()
+
+        return {
+            "pending_events": row["pending"] or 0,
+            "synced_events": row["synced"] or 0,
+            "total_events": row["total"] or 0,
+            "db_path": self.db_path
+        }
+
+    def close(self) -> None:
+        """Cierra la conexión a la base de datos."""
+        self.conn.close()
@@ -0,0 +1,683 @@
+"""
+tracker.py - Deduplicación de pasajeros por similitud de rostros
+
+FaceTracker evita contar dos veces al mismo pasajero: cada rostro
+nuevo se indexa en una colección de AWS Rekognition y los rostros
+entrantes se buscan contra ella. Los rostros expiran tras un TTL
+(el mismo pasajero que vuelve a subir horas después cuenta de
+nuevo). Soporta una lista de personal autorizado (conductor,
+operador) que nunca se cuenta, y un cache offline para guardar
+rostros cuando no hay conexión.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+from ._lazy import lazy_import
+from .storage import apply_sqlite_pragmas
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def _nearest_hash_py(query, hashes, max_dist):
+    """
+    Busca el pHash almacenado más cercano por distancia de Hamming.
+
+    Versión en Python puro, usada cuando Numba no está disponible.
+
+    Args:
+        query: Hash de consulta (uint64)
+        hashes: Arreglo np.uint64 de hashes almacenados
+        max_dist: Distancia de Hamming máxima aceptable
+
+    Returns:
+        Índice del hash más cercano dentro del radio, o -1
+    """
+    best_idx = -1
+    best_dist = max_dist + 1
+    q = int(query)
+    for i in range(len(hashes)):
+        # bin().count("1") en vez de int.bit_count(): este camino corre
+        # justo en instalaciones mínimas sin Numba, donde un intérprete
+        # anterior a 3.10 es lo más probable
+        dist = bin(q ^ int(hashes[i])).count("1")
+        if dist < best_dist:
+            best_dist = dist
+            best_idx = i
+    return best_idx
+
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _nearest_hash(query, hashes, max_dist):  # pragma: no cover - requiere numba
+        best_idx = -1
+        best_dist = max_dist + 1
+        for i in range(hashes.shape[0]):
+            # popcount SWAR de 64 bits (Numba no expone bit_count)
+            x = query ^ hashes[i]
+            x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+            x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+            x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+            dist = (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+            if dist < best_dist:
+                best_dist = dist
+                best_idx = i
+        return best_idx
+else:
+    _nearest_hash = _nearest_hash_py
+
+# Prefijo de ExternalImageId para rostros de personal autorizado
+EXCLUDED_PREFIX = "excluded_"
+
+COLLECTION_ID = "transport-monitor-passengers"
+
+# Distancia de Hamming máxima entre pHashes de 64 bits para
+# considerar dos rostros como casi-duplicados sin consultar AWS
+PHASH_HAMMING_RADIUS = 6
+
+# Dimensión de la firma local de apariencia (16x16 en gris)
+SIGNATURE_DIM = 256
+
+# Producto punto máximo entre dos firmas int8 normalizadas a 127
+SIGNATURE_MAX_SCORE = 127 * 127
+
+
+class FaceTracker:
+    """
+    Rastreador de rostros con TTL para deduplicación de pasajeros.
+
+    En modo dry_run no llama a AWS: todos los rostros se consideran
+    nuevos pasajeros (útil para desarrollo y tests).
+    """
+
+    # Búsquedas concurrentes a Rekognition al procesar lotes
+    BATCH_WORKERS = 8
+
+    # Ventana de debounce (segundos) antes de persistir el cache
+    # offline: agrupa los rostros que llegan juntos en una transacción
+    CACHE_FLUSH_DEBOUNCE = 0.5
+
+    def __init__(self, ttl_minutes: int = 180,
+                 similarity_threshold: float = 80.0,
+                 max_faces: int = 500,
+                 excluded_faces: Optional[List[str]] = None,
+                 offline_cache_path: Optional[str] = None,
+                 dry_run: bool = False,
+                 region: str = "us-east-1"):
+        """
+        Inicializa el rastreador de rostros.
+
+        Args:
+            ttl_minutes: Minutos antes de "olvidar" un pasajero
+            similarity_threshold: Umbral de similitud Rekognition (0-100)
+            max_faces: Máximo de rostros rastreados simultáneamente
+            excluded_faces: Rutas a fotos de personal autorizado a ignorar
+            offline_cache_path: Base SQLite para rostros sin procesar offline
+            dry_run: Si True, no llama a AWS
+            region: Región de AWS Rekognition
+        """
+        self.ttl_minutes = ttl_minutes
+        self.similarity_threshold = similarity_threshold
+        self.max_faces = max_faces
+        self.dry_run = dry_run
+        self.region = region
+        self.logger = logging.getLogger(__name__)
+
+        # face_id -> timestamp de última vez visto
+        self._faces: dict = {}
+        # Huella xxHash64 de los bytes de la imagen -> face_id: detecta
+        # reenvíos del mismo recorte exacto con un solo hash + probe
+        self._seen: dict = {}
+        # pHash de 64 bits -> face_id, para resolver duplicados con un
+        # lookup O(1) local antes de pagar la llamada a Rekognition
+        self._phash_index: dict = {}
+        # Vista del índice como arreglo uint64 contiguo para el barrido
+        # de Hamming (se reconstruye perezosamente tras mutaciones)
+        self._phash_array = np.empty(0, dtype=np.uint64)
+        self._phash_ids: List[str] = []
+        self._phash_dirty = False
+        # Firmas de apariencia cuantizadas a int8 en un arreglo (N, D)
+        # contiguo: 4x menos memoria y tráfico DRAM que float32, y la
+        # comparación es un gemv entero vectorizado de NumPy
+        self._sig_store = np.empty((0, SIGNATURE_DIM), dtype=np.int8)
+        self._sig_ids: List[str] = []
+        self._excluded_paths = list(excluded_faces) if excluded_faces else []
+
+        # Protege el estado local cuando is_new_passenger_batch()
+        # despacha varias búsquedas en paralelo; solo la parte de red
+        # corre fuera del lock
+        self._state_lock = threading.RLock()
+        self._batch_executor: Optional[ThreadPoolExecutor] = None
+
+        self._stats = {
+            "new_passengers": 0,
+            "duplicate_passengers": 0,
+            "excluded_detected": 0,
+            "phash_hits": 0,
+            "signature_hits": 0,
+            "offline_cached": 0,
+            "api_errors": 0
+        }
+
+        self._client = None
+        if not dry_run:
+            import boto3
+            self._client = boto3.client("rekognition", region_name=region)
+            self._ensure_collection()
+            self._index_excluded_faces()
+
+        self._cache_conn: Optional[sqlite3.Connection] = None
+        # Rostros pendientes de persistir: el camino caliente solo
+        # encola en memoria; un thread de fondo hace la escritura
+        self._pending_cache: List[bytes] = []
+        self._cache_lock = threading.Lock()
+        self._cache_dirty = threading.Event()
+        self._cache_stop = threading.Event()
+        self._cache_thread: Optional[threading.Thread] = None
+        if offline_cache_path:
+            self._init_offline_cache(offline_cache_path)
+
+    def _ensure_collection(self) -> None:
+        """Crea la colección de Rekognition si no existe."""
+        try:
+            self._client.create_collection(CollectionId=COLLECTION_ID)
+            self.logger.info(f"Colección creada: {COLLECTION_ID}")
+        except self._client.exceptions.ResourceAlreadyExistsException:
+            pass
+        except Exception as e:
+            self.logger.error(f"Error creando colección: {e}")
+
+    def _index_excluded_faces(self) -> None:
+        """Indexa las fotos de personal autorizado en la colección."""
+        for path in self._excluded_paths:
+            if not os.path.exists(path):
+                self.logger.warning(f"Foto de excluido no encontrada: {path}")
+                continue
+            try:
+                with open(path, "rb") as f:
+                    image_bytes = f.read()
+                external_id = EXCLUDED_PREFIX + os.path.splitext(os.path.basename(path))[0]
+                self._client.index_faces(
+                    CollectionId=COLLECTION_ID,
+                    Image={"Bytes": image_bytes},
+                    ExternalImageId=external_id,
+                    MaxFaces=1
+                )
+                self.logger.info(f"Rostro excluido indexado: {external_id}")
+            except Exception as e:
+                self.logger.error(f"Error indexando rostro excluido {path}: {e}")
+
+    def _init_offline_cache(self, cache_path: str) -> None:
+        """Inicializa la base SQLite del cache offline y su writer."""
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self._cache_conn = sqlite3.connect(cache_path, check_same_thread=False)
+        apply_sqlite_pragmas(self._cache_conn, cache_path)
+        self._cache_conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_faces (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                image BLOB NOT NULL,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self._cache_conn.commit()
+
+        self._cache_thread = threading.Thread(target=self._cache_writer, daemon=True)
+        self._cache_thread.start()
+
+    def _cache_writer(self) -> None:
+        """
+        Thread de fondo que persiste el cache offline.
+
+        Espera la señal de rostros pendientes, deja pasar la ventana
+        de debounce para agrupar llegadas cercanas y escribe todo el
+        lote en una transacción. El camino caliente del tracker nunca
+        toca el disco.
+        """
+        while True:
+            self._cache_dirty.wait()
+            if self._cache_stop.is_set():
+                break
+            # Limpiar ANTES del debounce: una señal puesta durante el
+            # sleep (rostros nuevos o el stop de close()) debe
+            # sobrevivir para la siguiente vuelta del wait(); limpiar
+            # después la borraría y el thread quedaría bloqueado
+            self._cache_dirty.clear()
+            time.sleep(self.CACHE_FLUSH_DEBOUNCE)
+            self._flush_cache()
+        # Drenar lo que quede al apagar
+        self._flush_cache()
+
+    def _flush_cache(self) -> None:
+        """Escribe los rostros pendientes en una sola transacción."""
+        with self._cache_lock:
+            pending, self._pending_cache = self._pending_cache, []
+        if not pending or self._cache_conn is None:
+            return
+        try:
+            with self._cache_conn:
+                self._cache_conn.executemany(
+                    "INSERT INTO pending_faces (image) VALUES (?)",
+                    [(image,) for image in pending]
+                )
+        except Exception as e:
+            self.logger.error(f"Error persistiendo cache offline: {e}")
+
+    def _to_jpeg_bytes(self, face_image: Union[np.ndarray, bytes]) -> bytes:
+        """
+        Normaliza la imagen del rostro a bytes JPEG.
+
+        Args:
+            face_image: Recorte BGR (ndarray) o bytes JPEG ya codificados
+
+        Returns:
+            Bytes JPEG
+        """
+        if isinstance(face_image, bytes):
+            return face_image
+        ok, encoded = cv2.imencode(".jpg", face_image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if not ok:
+            raise ValueError("No se pudo codificar el rostro a JPEG")
+        return encoded.tobytes()
+
+    @staticmethod
+    def _fingerprint(face_image: Union[np.ndarray, bytes]) -> int:
+        """
+        Calcula la huella de 64 bits de los bytes de la imagen.
+
+        Usa xxHash (xxh3, vectorizado, ~GB/s) cuando está instalado;
+        si no, blake2b truncado a 8 bytes. No hay requisito
+        criptográfico: solo identifica reenvíos del mismo buffer.
+
+        Args:
+            face_image: Recorte BGR (ndarray) o bytes JPEG
+
+        Returns:
+            Huella como int de 64 bits
+        """
+        data = face_image if isinstance(face_image, bytes) else face_image.tobytes()
+        if xxhash is not None:
+            return xxhash.xxh3_64_intdigest(data)
+        import hashlib
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+    def _phash(self, face_image: Union[np.ndarray, bytes]) -> Optional[int]:
+        """
+        Calcula un hash perceptual de 64 bits del rostro.
+
+        Reduce el rostro a 8x8 en escala de grises y compara cada
+        píxel contra la media: rostros casi idénticos producen hashes
+        a pocos bits de Hamming de distancia.
+
+        Args:
+            face_image: Recorte BGR (ndarray) o bytes JPEG
+
+        Returns:
+            Hash de 64 bits como int, o None si la imagen no decodifica
+        """
+        if isinstance(face_image, bytes):
+            decoded = cv2.imdecode(np.frombuffer(face_image, np.uint8), cv2.IMREAD_GRAYSCALE)
+            if decoded is None:
+                return None
+            gray = decoded
+        elif face_image.ndim == 3:
+            gray = cv2.cvtColor(face_image, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = face_image
+
+        tiny = cv2.resize(gray, (8, 8), interpolation=cv2.INTER_AREA)
+        bits = (tiny > tiny.mean()).astype(np.uint8).ravel()
+        return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+    def _rebuild_phash_view(self) -> None:
+        """Reconstruye el arreglo uint64 contiguo desde el índice."""
+        self._phash_array = np.fromiter(
+            self._phash_index.keys(), dtype=np.uint64, count=len(self._phash_index)
+        )
+        self._phash_ids = list(self._phash_index.values())
+        self._phash_dirty = False
+
+    def _signature(self, face_image: Union[np.ndarray, bytes]) -> Optional[np.ndarray]:
+        """
+        Calcula la firma de apariencia int8 del rostro.
+
+        Reduce el rostro a 16x16 en gris, centra en su media y
+        normaliza el vector a magnitud 127 antes de cuantizar a int8.
+        Dos recortes del mismo rostro producen firmas con producto
+        punto cercano al máximo.
+
+        Args:
+            face_image: Recorte BGR (ndarray) o bytes JPEG
+
+        Returns:
+            Vector int8 de SIGNATURE_DIM elementos, o None si la
+            imagen no decodifica
+        """
+        if isinstance(face_image, bytes):
+            gray = cv2.imdecode(np.frombuffer(face_image, np.uint8), cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                return None
+        elif face_image.ndim == 3:
+            gray = cv2.cvtColor(face_image, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = face_image
+
+        tiny = cv2.resize(gray, (16, 16), interpolation=cv2.INTER_AREA)
+        vector = tiny.astype(np.float32).ravel()
+        vector -= vector.mean()
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return np.clip(vector / norm * 127, -128, 127).astype(np.int8)
+
+    def _best_signature_match(self, signature: np.ndarray) -> Optional[str]:
+        """
+        Busca el rostro rastreado con firma más similar.
+
+        La comparación es un solo producto matriz-vector entero sobre
+        el almacén int8 (acumulación int32), sin tocar float.
+
+        Args:
+            signature: Firma int8 del rostro entrante
+
+        Returns:
+            face_id del rostro cuya similitud supera el umbral, o None
+        """
+        if len(self._sig_store) == 0:
+            return None
+
+        scores = self._sig_store @ signature.astype(np.int32)
+        best = int(np.argmax(scores))
+        similarity = scores[best] / SIGNATURE_MAX_SCORE * 100.0
+        if similarity >= self.similarity_threshold:
+            return self._sig_ids[best]
+        return None
+
+    def _store_signature(self, signature: Optional[np.ndarray], face_id: str) -> None:
+        """Agrega la firma de un rostro nuevo al almacén int8."""
+        if signature is None:
+            return
+        self._sig_store = np.vstack([self._sig_store, signature[np.newaxis, :]])
+        self._sig_ids.append(face_id)
+
+    def _find_phash_match(self, phash: int) -> Optional[str]:
+        """
+        Busca un rostro ya rastreado con pHash igual o cercano.
+
+        Primero intenta el lookup exacto O(1); si falla, barre el
+        arreglo contiguo de hashes con el kernel de Hamming (compilado
+        con Numba cuando está disponible, Python puro si no).
+
+        Args:
+            phash: Hash perceptual del rostro entrante
+
+        Returns:
+            face_id del rostro coincidente, o None
+        """
+        face_id = self._phash_index.get(phash)
+        if face_id is not None:
+            return face_id
+
+        if self._phash_dirty:
+            self._rebuild_phash_view()
+        if len(self._phash_array) == 0:
+            return None
+
+        idx = _nearest_hash(np.uint64(phash), self._phash_array, PHASH_HAMMING_RADIUS)
+        if idx < 0:
+            return None
+        return self._phash_ids[idx]
+
+    def _forget_face(self, face_id: str) -> None:
+        """Elimina un rostro del rastreo y de sus índices locales."""
+        self._faces.pop(face_id, None)
+        for fingerprint in [f for f, fid in self._seen.items() if fid == face_id]:
+            del self._seen[fingerprint]
+        stale = [h for h, fid in self._phash_index.items() if fid == face_id]
+        for phash in stale:
+            del self._phash_index[phash]
+        if stale:
+            self._phash_dirty = True
+        if face_id in self._sig_ids:
+            keep = [i for i, fid in enumerate(self._sig_ids) if fid != face_id]
+            self._sig_store = self._sig_store[keep]
+            self._sig_ids = [self._sig_ids[i] for i in keep]
+
+    def _purge_expired(self) -> None:
+        """Elimina del rastreo los rostros cuyo TTL expiró."""
+        now = time.time()
+        ttl_seconds = self.ttl_minutes * 60
+        expired = [fid for fid, seen in self._faces.items() if now - seen > ttl_seconds]
+        for face_id in expired:
+            self._forget_face(face_id)
+        if expired:
+            self.logger.debug(f"Rostros expirados por TTL: {len(expired)}")
+
+    def _evict_oldest(self) -> None:
+        """Elimina los rostros más antiguos si se superó max_faces."""
+        while len(self._faces) >= self.max_faces:
+            oldest = min(self._faces, key=self._faces.get)
+            self._forget_face(oldest)
+
+    def _cache_offline(self, jpeg_bytes: bytes) -> None:
+        """Encola un rostro para el cache offline (escritura diferida)."""
+        if self._cache_conn is None:
+            return
+        with self._cache_lock:
+            self._pending_cache.append(jpeg_bytes)
+        self._cache_dirty.set()
+        self._stats["offline_cached"] += 1
+
+    def is_new_passenger(self, face_image: Union[np.ndarray, bytes]) -> Tuple[bool, Optional[str], bool]:
+        """
+        Determina si un rostro corresponde a un pasajero nuevo.
+
+        Args:
+            face_image: Recorte del rostro (ndarray BGR o bytes JPEG)
+
+        Returns:
+            Tupla (is_new, face_id, is_excluded):
+            - is_new: True si es un pasajero no visto dentro del TTL
+            - face_id: Identificador del rostro (None si no se pudo obtener)
+            - is_excluded: True si es personal autorizado
+        """
+        with self._state_lock:
+            self._purge_expired()
+
+            if self.dry_run:
+                # Sin AWS todos los rostros son pasajeros nuevos
+                face_id = uuid.uuid4().hex
+                self._evict_oldest()
+                self._faces[face_id] = time.time()
+                self._stats["new_passengers"] += 1
+                return True, face_id, False
+
+            # Reenvío del mismo buffer exacto: un hash rápido + probe de
+            # dict lo resuelve antes que cualquier trabajo de imagen
+            fingerprint = self._fingerprint(face_image)
+            seen_id = self._seen.get(fingerprint)
+            if seen_id is not None and seen_id in self._faces:
+                self._faces[seen_id] = time.time()
+                self._stats["duplicate_passengers"] += 1
+                return False, seen_id, False
+
+            # Pre-filtro local: un duplicado con pHash casi idéntico se
+            # resuelve con un lookup en memoria sin pagar la llamada a AWS
+            phash = self._phash(face_image)
+            if phash is not None:
+                matched_id = self._find_phash_match(phash)
+                if matched_id is not None and matched_id in self._faces:
+                    self._faces[matched_id] = time.time()
+                    self._stats["phash_hits"] += 1
+                    self._stats["duplicate_passengers"] += 1
+                    return False, matched_id, False
+
+            # Segundo pre-filtro: similitud de firmas int8 (tolera más
+            # variación de pose/iluminación que el pHash exacto)
+            signature = self._signature(face_image)
+            if signature is not None:
+                matched_id = self._best_signature_match(signature)
+                if matched_id is not None and matched_id in self._faces:
+                    self._faces[matched_id] = time.time()
+                    self._stats["signature_hits"] += 1
+                    self._stats["duplicate_passengers"] += 1
+                    return False, matched_id, False
+
+        jpeg_bytes = self._to_jpeg_bytes(face_image)
+
+        # La llamada de red corre fuera del lock: los clientes de boto3
+        # son thread-safe y así las búsquedas de un lote se solapan
+        try:
+            response = self._client.search_faces_by_image(
+                CollectionId=COLLECTION_ID,
+                Image={"Bytes": jpeg_bytes},
+                FaceMatchThreshold=self.similarity_threshold,
+                MaxFaces=1
+            )
+        except Exception as e:
+            # Sin conexión: guardar para después y contar como nuevo
+            self.logger.warning(f"Error buscando rostro en Rekognition: {e}")
+            with self._state_lock:
+                self._stats["api_errors"] += 1
+                self._cache_offline(jpeg_bytes)
+            return True, None, False
+
+        matches = response.get("FaceMatches", [])
+        if matches:
+            face = matches[0]["Face"]
+            external_id = face.get("ExternalImageId", "")
+
+            if external_id.startswith(EXCLUDED_PREFIX):
+                with self._state_lock:
+                    self._stats["excluded_detected"] += 1
+                return False, face["FaceId"], True
+
+            with self._state_lock:
+                face_id = face["FaceId"]
+                self._seen[fingerprint] = face_id
+                if phash is not None:
+                    self._phash_index[phash] = face_id
+                    self._phash_dirty = True
+                if face_id not in self._sig_ids:
+                    self._store_signature(signature, face_id)
+
+                if face_id in self._faces:
+                    # Pasajero ya contado dentro del TTL
+                    self._faces[face_id] = time.time()
+                    self._stats["duplicate_passengers"] += 1
+                    return False, face_id, False
+
+                # Conocido en la colección pero TTL expirado: cuenta de nuevo
+                self._faces[face_id] = time.time()
+                self._stats["new_passengers"] += 1
+                return True, face_id, False
+
+        # Rostro no visto: indexarlo como nuevo pasajero
+        try:
+            index_response = self._client.index_faces(
+                CollectionId=COLLECTION_ID,
+                Image={"Bytes": jpeg_bytes},
+                MaxFaces=1
+            )
+            records = index_response.get("FaceRecords", [])
+            face_id = records[0]["Face"]["FaceId"] if records else uuid.uuid4().hex
+        except Exception as e:
+            self.logger.warning(f"Error indexando rostro: {e}")
+            with self._state_lock:
+                self._stats["api_errors"] += 1
+                self._cache_offline(jpeg_bytes)
+            face_id = None
+
+        with self._state_lock:
+            if face_id is not None:
+                self._evict_oldest()
+                self._faces[face_id] = time.time()
+                self._seen[fingerprint] = face_id
+                if phash is not None:
+                    self._phash_index[phash] = face_id
+                    self._phash_dirty = True
+                self._store_signature(signature, face_id)
+            self._stats["new_passengers"] += 1
+        return True, face_id, False
+
+    def is_new_passenger_batch(self, face_images: List[Union[np.ndarray, bytes]]
+                               ) -> List[Tuple[bool, Optional[str], bool]]:
+        """
+        Resuelve varios rostros del mismo frame contra el rastreador.
+
+        Igual que en FaceCounter, Rekognition no acepta lotes en una
+        sola petición: las búsquedas se despachan en paralelo con un
+        pool de threads para solapar las peticiones HTTPS. El estado
+        local del tracker queda protegido por un lock, así que los
+        pre-filtros en memoria se serializan y solo la red se solapa.
+
+        Args:
+            face_images: Recortes de rostros (ndarray BGR o bytes JPEG)
+
+        Returns:
+            Lista de tuplas (is_new, face_id, is_excluded), en el
+            mismo orden que face_images
+        """
+        if not face_images:
+            return []
+
+        # Sin red no hay nada que solapar: en dry_run (o con un solo
+        # rostro) el camino secuencial evita el overhead del pool
+        if self.dry_run or len(face_images) == 1:
+            return [self.is_new_passenger(image) for image in face_images]
+
+        if self._batch_executor is None:
+            self._batch_executor = ThreadPoolExecutor(max_workers=self.BATCH_WORKERS)
+        return list(self._batch_executor.map(self.is_new_passenger, face_images))
+
+    def get_stats(self) -> dict:
+        """
+        Retorna estadísticas del rastreador.
+
+        Returns:
+            Diccionario con rostros rastreados, nuevos, duplicados y tasa
+        """
+        total = self._stats["new_passengers"] + self._stats["duplicate_passengers"]
+        duplicate_rate = (self._stats["duplicate_passengers"] / total * 100) if total else 0.0
+
+        stats = dict(self._stats)
+        stats["tracked_faces"] = len(self._faces)
+        stats["excluded_faces"] = len(self._excluded_paths)
+        stats["duplicate_rate"] = duplicate_rate
+        return stats
+
+    def close(self) -> None:
+        """Cierra el cache offline y el pool de búsquedas si existen."""
+        if self._batch_executor is not None:
+            self._batch_executor.shutdown(wait=False)
+            self._batch_executor = None
+        if self._cache_conn is not None:
+            # Despertar al writer para que drene y termine
+            self._cache_stop.set()
+            self._cache_dirty.set()
+            if self._cache_thread is not None:
+                self._cache_thread.join(timeout=2.0)
+            self._flush_cache()
+            self._cache_conn.close()
+            self._cache_conn = None
@@ -1,237 +1,209 @@
 """
-test_modules.py - Script de prueba para todos los modulos
+test_modules.py - Tests de todos los modulos
 
-Ejecutar con: python test_modules.py
+Ejecutar con: python -m pytest test_modules.py
 """
 
-import sys
+import time
+
 import numpy as np
+import pytest
+
+# Frame negro compartido entre tests: detect()/count_faces() no mutan
+# su entrada, asi que reutilizar el mismo buffer es seguro y evita
+# asignar 900 KB por llamada
+_BLACK_FRAME = np.zeros((480, 640, 3), dtype=np.uint8)
+
+
+@pytest.fixture(scope="module")
+def local_buffer():
+    from stream_count_faces import LocalBuffer
+    buffer = LocalBuffer(":memory:")
+    yield buffer
+    buffer.close()
+
+
+@pytest.fixture(scope="module")
+def passenger_store():
+    from stream_count_faces import PassengerEventStore
+    store = PassengerEventStore(":memory:")
+    yield store
+    store.close()
+
+
+@pytest.fixture(scope="module")
+def location_provider():
+    from stream_count_faces import LocationProvider
+    provider = LocationProvider(use_ip_fallback=True)
+    yield provider
+    provider.close()
+
 
 def test_motion_detector():
-    print("\n=== Test MotionDetector ===")
     from stream_count_faces import MotionDetector
-    
+
     md = MotionDetector(min_area=5000, threshold=25)
-    
+
     # Frame negro (establece referencia)
-    f1 = np.zeros((480, 640, 3), dtype=np.uint8)
-    result1 = md.detect(f1)
-    print(f"Frame negro (referencia): motion={result1}")
-    assert result1 == False, "Primer frame deberia ser False"
-    
-    # Frame identico
-    f2 = np.zeros((480, 640, 3), dtype=np.uint8)
-    result2 = md.detect(f2)
-    print(f"Frame negro (igual): motion={result2}")
-    assert result2 == False, "Frame igual deberia ser False"
-    
-    # Frame con cambio
-    f3 = np.ones((480, 640, 3), dtype=np.uint8) * 255
-    result3 = md.detect(f3)
-    print(f"Frame blanco (diferente): motion={result3}")
-    assert result3 == True, "Frame diferente deberia ser True"
-    
+    assert md.detect(_BLACK_FRAME) == False, "Primer frame deberia ser False"
+
+    # Frame identico (mismo buffer, detect no lo modifica)
+    assert md.detect(_BLACK_FRAME) == False, "Frame igual deberia ser False"
+
+    # Frame con cambio (np.full escribe 255 directo en uint8, sin
+    # materializar un arreglo de unos intermedio)
+    f3 = np.full((480, 640, 3), 255, dtype=np.uint8)
+    assert md.detect(f3) == True, "Frame diferente deberia ser True"
+
     stats = md.get_stats()
-    print(f"Stats: {stats}")
-    print("[OK] MotionDetector: PASSED")
-    return True
+    assert stats["frames_processed"] == 3
+    assert stats["motion_events"] == 1
+
+
+def test_local_buffer(local_buffer):
+    # Guardar eventos en lote (una sola transaccion)
+    id1, id2, id3 = local_buffer.save_events_bulk([
+        ("face_count", {"count": 5, "location": "entrance"}),
+        ("motion", {"area": 1000}),
+        ("face_count", {"count": 2}),
+    ])
 
-def test_local_buffer():
-    print("\n=== Test LocalBuffer ===")
-    from stream_count_faces import LocalBuffer
-    
-    lb = LocalBuffer(":memory:")
-    
-    # Guardar eventos
-    id1 = lb.save_event("face_count", {"count": 5, "location": "entrance"})
-    id2 = lb.save_event("motion", {"area": 1000})
-    id3 = lb.save_event("face_count", {"count": 2})
-    print(f"Eventos guardados: {id1}, {id2}, {id3}")
-    
     # Obtener pendientes
-    pending = lb.get_pending_events()
-    print(f"Eventos pendientes: {len(pending)}")
+    pending = local_buffer.get_pending_events()
     assert len(pending) == 3, "Deberian haber 3 eventos pendientes"
-    
-    # Marcar como sincronizados
-    lb.mark_synced([id1, id2])
-    
-    # Verificar stats
-    stats = lb.get_stats()
-    print(f"Stats: pending={stats['pending_events']}, synced={stats['synced_events']}")
-    assert stats['pending_events'] == 1, "Deberia haber 1 evento pendiente"
-    assert stats['synced_events'] == 2, "Deberian haber 2 eventos sincronizados"
-    
-    print("[OK] LocalBuffer: PASSED")
-    return True
+
+    # Extraer y marcar en una sola sentencia atomica
+    popped = local_buffer.pop_pending_events(limit=2)
+    assert [event["id"] for event in popped] == [id1, id2]
+
+    stats = local_buffer.get_stats()
+    assert stats["pending_events"] == 1, "Deberia haber 1 evento pendiente"
+    assert stats["synced_events"] == 2, "Deberian haber 2 eventos sincronizados"
+
 
 def test_face_counter():
-    print("\n=== Test FaceCounter (dry_run) ===")
     from stream_count_faces import FaceCounter
-    
+
     fc = FaceCounter(dry_run=True)
-    
+
     # Frame negro (sin rostros)
-    frame = np.zeros((480, 640, 3), dtype=np.uint8)
-    faces = fc.count_faces(frame)
-    print(f"Rostros en frame negro: {len(faces)}")
+    faces = fc.count_faces(_BLACK_FRAME)
     assert len(faces) == 0, "Frame negro no deberia tener rostros"
-    
+
     stats = fc.get_stats()
-    print(f"Stats: frames={stats['total_frames_processed']}, dry_run={stats['dry_run']}")
-    assert stats['dry_run'] == True, "Deberia estar en dry_run"
-    assert stats['total_frames_processed'] == 1, "Deberia haber procesado 1 frame"
-    
-    print("[OK] FaceCounter: PASSED")
-    return True
-
-def test_face_tracker():
-    print("\n=== Test FaceTracker (dry_run) ===")
+    assert stats["dry_run"] == True, "Deberia estar en dry_run"
+    assert stats["total_frames_processed"] == 1, "Deberia haber procesado 1 frame"
+
+
+def test_pipeline():
+    from stream_count_faces import FaceCounter, MotionDetector, Pipeline
+
+    pipeline = Pipeline(MotionDetector(min_area=5000, threshold=25),
+                        FaceCounter(dry_run=True), max_pending=1)
+
+    # Con el worker bloqueado en la etapa de movimiento, el unico slot
+    # queda ocupado y el siguiente frame se descarta de forma
+    # determinista en vez de encolarse
+    pipeline._motion_lock.acquire()
+    in_flight = pipeline.submit(_BLACK_FRAME)
+    assert in_flight is not None, "El primer frame deberia aceptarse"
+    assert pipeline.submit(_BLACK_FRAME) is None, "Sin slots deberia descartar"
+    pipeline._motion_lock.release()
+
+    # Primer frame: establece la referencia de movimiento, sin rostros
+    assert in_flight.result(timeout=5.0) == []
+
+    pipeline.shutdown()
+
+    stats = pipeline.get_stats()
+    assert stats["frames_submitted"] == 1
+    assert stats["frames_dropped"] == 1
+
+
+@pytest.mark.parametrize("fake_face", [b"fake_face_image_1", b"fake_face_image_2"])
+def test_face_tracker_single(fake_face):
     from stream_count_faces import FaceTracker
-    
+
     tracker = FaceTracker(dry_run=True, ttl_minutes=5, max_faces=10)
-    
-    # Simular deteccion de pasajeros
-    fake_face_1 = b"fake_face_image_1"
-    fake_face_2 = b"fake_face_image_2"
-    
-    # Primer pasajero - deberia ser nuevo
-    is_new1, face_id1, is_excluded1 = tracker.is_new_passenger(fake_face_1)
-    print(f"Pasajero 1: is_new={is_new1}, face_id={face_id1}, is_excluded={is_excluded1}")
-    assert is_new1 == True, "Primer pasajero deberia ser nuevo"
-    assert is_excluded1 == False, "No deberia ser excluido"
-    
-    # Segundo pasajero - deberia ser nuevo (dry_run siempre es nuevo)
-    is_new2, face_id2, is_excluded2 = tracker.is_new_passenger(fake_face_2)
-    print(f"Pasajero 2: is_new={is_new2}, face_id={face_id2}, is_excluded={is_excluded2}")
-    assert is_new2 == True, "Segundo pasajero deberia ser nuevo en dry_run"
-    
+
+    is_new, face_id, is_excluded = tracker.is_new_passenger(fake_face)
+    assert is_new == True, "Primer pasajero deberia ser nuevo"
+    assert face_id is not None
+    assert is_excluded == False, "No deberia ser excluido"
+
+
+def test_face_tracker_stats():
+    from stream_count_faces import FaceTracker
+
+    tracker = FaceTracker(dry_run=True, ttl_minutes=5, max_faces=10)
+
+    # En dry_run todos los rostros son pasajeros nuevos
+    tracker.is_new_passenger(b"fake_face_image_1")
+    tracker.is_new_passenger(b"fake_face_image_2")
+
     stats = tracker.get_stats()
-    print(f"Stats: tracked={stats['tracked_faces']}, new={stats['new_passengers']}, excluded={stats['excluded_faces']}")
-    assert stats['tracked_faces'] == 2, "Deberian haber 2 rostros rastreados"
-    assert stats['new_passengers'] == 2, "Deberian haber 2 nuevos pasajeros"
-    
-    print("[OK] FaceTracker: PASSED")
-    return True
+    assert stats["tracked_faces"] == 2, "Deberian haber 2 rostros rastreados"
+    assert stats["new_passengers"] == 2, "Deberian haber 2 nuevos pasajeros"
+
+
+def test_face_tracker_cache_close(tmp_path):
+    import sqlite3
+
+    from stream_count_faces import FaceTracker
+
+    cache_path = str(tmp_path / "face_cache.db")
+    tracker = FaceTracker(dry_run=True, ttl_minutes=5, max_faces=10,
+                          offline_cache_path=cache_path)
+
+    # Cerrar con un flush pendiente: el writer esta (o estara) en su
+    # ventana de debounce y close() debe despertarlo, drenar el rostro
+    # encolado y retornar sin agotar el timeout del join
+    tracker._cache_offline(b"fake_jpeg_bytes")
+    start = time.monotonic()
+    tracker.close()
+    elapsed = time.monotonic() - start
+    assert elapsed < 2.0, "close() no deberia agotar el timeout del join"
+    assert not tracker._cache_thread.is_alive(), "El writer deberia haber terminado"
+
+    conn = sqlite3.connect(cache_path)
+    count = conn.execute("SELECT COUNT(*) FROM pending_faces").fetchone()[0]
+    conn.close()
+    assert count == 1, "El rostro pendiente deberia haberse persistido"
+
 
 def test_transport_monitor_import():
-    print("\n=== Test Transport Monitor Import ===")
-    # Importar el modulo principal
     import transport_monitor
-    print(f"transport_monitor importado: {transport_monitor}")
-    print(f"TransportMonitor class: {transport_monitor.TransportMonitor}")
-    print("[OK] Transport Monitor Import: PASSED")
-    return True
-
-def main():
-    print("=" * 50)
-    print("TRANSPORT MONITOR - TEST DE MODULOS")
-    print("=" * 50)
-    
-    all_passed = True
-    
-    try:
-        all_passed &= test_motion_detector()
-    except Exception as e:
-        print(f"[FAIL] MotionDetector: FAILED - {e}")
-        all_passed = False
-    
-    try:
-        all_passed &= test_local_buffer()
-    except Exception as e:
-        print(f"[FAIL] LocalBuffer: FAILED - {e}")
-        all_passed = False
-    
-    try:
-        all_passed &= test_face_counter()
-    except Exception as e:
-        print(f"[FAIL] FaceCounter: FAILED - {e}")
-        all_passed = False
-    
-    try:
-        all_passed &= test_face_tracker()
-    except Exception as e:
-        print(f"[FAIL] FaceTracker: FAILED - {e}")
-        all_passed = False
-    
-    try:
-        all_passed &= test_transport_monitor_import()
-    except Exception as e:
-        print(f"[FAIL] Transport Monitor Import: FAILED - {e}")
-        all_passed = False
-    
-    try:
-        all_passed &= test_geolocation()
-    except Exception as e:
-        print(f"[FAIL] Geolocation: FAILED - {e}")
-        all_passed = False
-    
-    try:
-        all_passed &= test_passenger_event_store()
-    except Exception as e:
-        print(f"[FAIL] PassengerEventStore: FAILED - {e}")
-        all_passed = False
-    
-    print("\n" + "=" * 50)
-    if all_passed:
-        print("TODOS LOS TESTS PASARON [OK]")
-        return 0
-    else:
-        print("ALGUNOS TESTS FALLARON [FAIL]")
-        return 1
-
-
-def test_geolocation():
-    print("\n=== Test LocationProvider ===")
-    from stream_count_faces import LocationProvider
-    
-    # Crear provider sin GPS (solo IP fallback)
-    provider = LocationProvider(use_ip_fallback=True)
-    
-    # Obtener ubicación
-    location = provider.get_location()
-    print(f"Ubicación obtenida: lat={location.latitude}, lng={location.longitude}, source={location.source}")
-    
-    # Verificar estadísticas
-    stats = provider.get_stats()
-    print(f"Stats: ip_fallback={stats['ip_fallback_enabled']}, cached={stats['cached_location'] is not None}")
-    
-    provider.close()
-    print("[OK] LocationProvider: PASSED")
-    return True
 
+    assert transport_monitor.TransportMonitor is not None
 
-def test_passenger_event_store():
-    print("\n=== Test PassengerEventStore ===")
-    from stream_count_faces import PassengerEventStore
-    
-    # Usar base de datos en memoria
-    store = PassengerEventStore(":memory:")
-    
+
+def test_geolocation(location_provider):
+    # Sin GPS ni red la ubicacion degrada a source="none"
+    location = location_provider.get_location()
+    assert location.source in ("gps", "ip", "none")
+
+    stats = location_provider.get_stats()
+    assert stats["ip_fallback_enabled"] == True
+
+
+def test_passenger_event_store(passenger_store):
     # Registrar algunos abordajes
-    id1 = store.record_boarding(face_id="abc123", latitude=10.5, longitude=-66.9, location_source="gps")
-    id2 = store.record_boarding(face_id="def456", latitude=10.5, longitude=-66.9, location_source="gps")
-    id3 = store.record_boarding(face_id="ghi789", latitude=None, longitude=None, location_source="none")
-    
-    print(f"Eventos registrados: {id1}, {id2}, {id3}")
-    
-    # Verificar estadísticas
-    stats = store.get_stats()
-    print(f"Stats: total={stats['total_events']}, con_ubicacion={stats['events_with_location']}, sin_ubicacion={stats['events_without_location']}")
-    
-    assert stats['total_events'] == 3, "Deberian haber 3 eventos"
-    assert stats['events_with_location'] == 2, "Deberian haber 2 eventos con ubicación"
-    assert stats['events_without_location'] == 1, "Deberia haber 1 evento sin ubicación"
-    
-    # Verificar stats por ubicación
-    loc_stats = store.get_location_stats()
-    print(f"Ubicaciones: {len(loc_stats)} paradas unicas")
-    if loc_stats:
-        print(f"Parada 1: lat={loc_stats[0]['latitude']}, lng={loc_stats[0]['longitude']}, pasajeros={loc_stats[0]['passenger_count']}")
-    
-    print("[OK] PassengerEventStore: PASSED")
-    return True
-
-
-if __name__ == "__main__":
-    sys.exit(main())
+    id1 = passenger_store.record_boarding(
+        face_id="abc123", latitude=10.5, longitude=-66.9, location_source="gps")
+    id2 = passenger_store.record_boarding(
+        face_id="def456", latitude=10.5, longitude=-66.9, location_source="gps")
+    id3 = passenger_store.record_boarding(
+        face_id="ghi789", latitude=None, longitude=None, location_source="none")
+    assert id1 < id2 < id3
+
+    stats = passenger_store.get_stats()
+    assert stats["total_events"] == 3, "Deberian haber 3 eventos"
+    assert stats["events_with_location"] == 2, "Deberian haber 2 eventos con ubicacion"
+    assert stats["events_without_location"] == 1, "Deberia haber 1 evento sin ubicacion"
+
+    # Verificar stats por ubicacion
+    loc_stats = passenger_store.get_location_stats()
+    assert len(loc_stats) == 1, "Deberia haber 1 parada unica"
+    assert loc_stats[0]["latitude"] == 10.5
+    assert loc_stats[0]["longitude"] == -66.9
+    assert loc_stats[0]["passenger_count"] == 2
@@ -18,19 +18,19 @@ Uso:
 import argparse
 import logging
 import os
+import queue
 import signal
 import sys
+import threading
 import time
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
-import yaml
-
-from stream_count_faces import (
-    VideoStream, MotionDetector, LocalBuffer, FaceCounter, 
-    FaceTracker, extract_face_image, LocationProvider, PassengerEventStore
-)
+# Los módulos pesados (cv2, yaml, stream_count_faces y su cadena de
+# boto3) se importan dentro de las funciones que los usan: así
+# `--help` y los errores de argumentos responden en milisegundos y el
+# arranque bajo systemd no paga imports que quizá no se necesiten.
 
 
 # Configuración de logging
@@ -69,6 +69,8 @@ def load_config(config_path: str) -> dict:
     Returns:
         Diccionario con la configuración
     """
+    import yaml
+
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
             config = yaml.safe_load(f)
@@ -82,6 +84,30 @@ def load_config(config_path: str) -> dict:
         return {}
 
 
+def deep_merge(dst: dict, src: dict) -> dict:
+    """
+    Mezcla recursivamente src sobre dst (src gana en conflictos).
+
+    A diferencia del update() superficial, las claves anidadas de dst
+    que src no menciona se conservan: un YAML que solo define
+    tracking.offline_cache_path no pierde el resto de los defaults de
+    tracking.
+
+    Args:
+        dst: Diccionario base (se modifica en el lugar)
+        src: Diccionario con overrides
+
+    Returns:
+        El mismo dst, ya mezclado
+    """
+    for key, value in src.items():
+        if isinstance(value, dict) and isinstance(dst.get(key), dict):
+            deep_merge(dst[key], value)
+        else:
+            dst[key] = value
+    return dst
+
+
 def get_default_config() -> dict:
     """
     Retorna configuración por defecto.
@@ -100,7 +126,9 @@ def get_default_config() -> dict:
             "min_area": 5000,
             "threshold": 25,
             "blur_kernel": 21,
-            "cooldown_frames": 5
+            "cooldown_frames": 5,
+            "skip_motion_every_n": 1,
+            "use_opencl": False
         },
         "detector": {
             "face_confidence_threshold": 90,
@@ -110,7 +138,8 @@ def get_default_config() -> dict:
         },
         "storage": {
             "database_path": "data/transport_events.db",
-            "retention_days": 30
+            "retention_days": 30,
+            "journal_mode": "WAL"
         },
         "aws": {
             "region": "us-east-1"
@@ -130,6 +159,85 @@ def get_default_config() -> dict:
     }
 
 
+def _classify_faces(faces, results, logger) -> tuple:
+    """
+    Clasifica los resultados del tracker en nuevos/duplicados/excluidos.
+
+    Es el bucle Python más caliente por frame, así que vive como
+    función de módulo con los métodos calientes pre-ligados a locales:
+    cada iteración corre sobre LOAD_FAST sin atributos de instancia.
+
+    Args:
+        faces: Rostros detectados en el frame
+        results: Tuplas (is_new, face_id, is_excluded) del tracker,
+            en el mismo orden que faces
+        logger: Logger para los mensajes de debug
+
+    Returns:
+        Tupla (new_passengers, new_face_ids, duplicates, excluded)
+    """
+    new_passengers = []
+    new_face_ids = []
+    duplicates = 0
+    excluded = 0
+    append_face = new_passengers.append
+    append_id = new_face_ids.append
+    debug = logger.debug
+
+    for face, (is_new, face_id, is_excluded) in zip(faces, results):
+        if is_excluded:
+            # Personal autorizado (operador, conductor)
+            excluded += 1
+            debug("Personal autorizado detectado, ignorando")
+        elif is_new:
+            append_face(face)
+            append_id(face_id)
+        else:
+            duplicates += 1
+            debug("Pasajero duplicado detectado: %s", face_id)
+
+    return new_passengers, new_face_ids, duplicates, excluded
+
+
+class MonitorStats:
+    """
+    Contadores del ciclo principal de monitoreo.
+
+    Con slots, cada incremento es un acceso directo a atributo en vez
+    de un hash + store de dict; estos contadores se tocan en cada
+    iteración del bucle de captura. Los slots se declaran a mano
+    (dataclass(slots=True) requiere Python 3.10 y el proyecto soporta
+    desde 3.8).
+    """
+
+    __slots__ = (
+        "start_time",
+        "frames_processed",
+        "motion_detected_count",
+        "faces_detected_total",
+        "new_passengers",
+        "duplicate_passengers",
+        "excluded_detected",
+        "events_saved",
+        "dropped_frames",
+    )
+
+    def __init__(self) -> None:
+        self.start_time: Optional[str] = None
+        self.frames_processed = 0
+        self.motion_detected_count = 0
+        self.faces_detected_total = 0
+        self.new_passengers = 0
+        self.duplicate_passengers = 0
+        self.excluded_detected = 0
+        self.events_saved = 0
+        self.dropped_frames = 0
+
+    def as_dict(self) -> dict:
+        """Retorna los contadores como diccionario plano."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
 class TransportMonitor:
     """
     Orquestador principal del sistema de monitoreo.
@@ -137,7 +245,16 @@ class TransportMonitor:
     Integra todos los componentes y gestiona el ciclo principal
     de captura, detección y almacenamiento de eventos.
     """
-    
+
+    # Lote de eventos: flush al llegar a este tamaño o al vencer el plazo
+    EVENT_BATCH_SIZE = 32
+    EVENT_FLUSH_SECONDS = 2.0
+
+    # Slots del anillo de frames para el handoff productor→worker:
+    # capacidad de la cola (4) + uno en proceso en el worker + margen,
+    # para que ningún slot se reescriba mientras siga en uso
+    FRAME_RING_SLOTS = 6
+
     def __init__(self, config: dict):
         """
         Inicializa el monitor de transporte.
@@ -148,19 +265,28 @@ class TransportMonitor:
         self.config = config
         self.running = False
         self.logger = logging.getLogger(__name__)
-        
+
+        # Cola acotada entre el bucle de captura (productor) y el worker
+        # de procesamiento (consumidor): chica para privilegiar frames
+        # frescos sobre frames acumulados
+        self.work_q: queue.Queue = queue.Queue(maxsize=4)
+        self._worker: Optional[threading.Thread] = None
+        # Anillo de buffers para el handoff de frames (se asigna al
+        # conocer la resolución del primer frame)
+        self._frame_ring: list = []
+        self._frame_ring_idx = 0
+        # Las estadísticas se actualizan desde ambos threads
+        self._stats_lock = threading.Lock()
+
+        # Lote de eventos pendientes de persistir: amortiza el costo de
+        # transacción/fsync de SQLite entre varios eventos
+        self._event_batch: list = []
+        self._batch_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
         # Estadísticas
-        self.stats = {
-            "start_time": None,
-            "frames_processed": 0,
-            "motion_detected_count": 0,
-            "faces_detected_total": 0,
-            "new_passengers": 0,
-            "duplicate_passengers": 0,
-            "excluded_detected": 0,
-            "events_saved": 0
-        }
-        
+        self.stats = MonitorStats()
+
         # Inicializar componentes
         self._init_components()
         
@@ -170,6 +296,11 @@ class TransportMonitor:
     
     def _init_components(self) -> None:
         """Inicializa todos los componentes del sistema."""
+        from stream_count_faces import (
+            VideoStream, MotionDetector, LocalBuffer, FaceCounter,
+            FaceTracker, LocationProvider, PassengerEventStore
+        )
+
         cam_config = self.config.get("camera", {})
         motion_config = self.config.get("motion", {})
         detector_config = self.config.get("detector", {})
@@ -194,7 +325,8 @@ class TransportMonitor:
             min_area=motion_config.get("min_area", 5000),
             threshold=motion_config.get("threshold", 25),
             blur_kernel=motion_config.get("blur_kernel", 21),
-            cooldown_frames=motion_config.get("cooldown_frames", 5)
+            cooldown_frames=motion_config.get("cooldown_frames", 5),
+            use_opencl=motion_config.get("use_opencl", False)
         )
         
         # FaceCounter
@@ -208,7 +340,8 @@ class TransportMonitor:
         
         # LocalBuffer
         self.local_buffer = LocalBuffer(
-            db_path=storage_config.get("database_path", "data/transport_events.db")
+            db_path=storage_config.get("database_path", "data/transport_events.db"),
+            journal_mode=storage_config.get("journal_mode", "WAL")
         )
         
         # FaceTracker (deduplicación de pasajeros)
@@ -234,7 +367,16 @@ class TransportMonitor:
         else:
             self.face_tracker = None
             self.logger.info("Tracking de pasajeros deshabilitado")
-        
+
+        # Especializar la etapa de rostros una sola vez: el worker llama
+        # self._process_faces sin re-evaluar la rama de tracking por frame
+        self._process_faces = (
+            self._process_faces_tracking
+            if self.tracking_enabled and self.face_tracker
+            else self._process_faces_passthrough
+        )
+
+
         # LocationProvider y PassengerEventStore (geolocalización)
         if self.location_enabled:
             self.location_provider = LocationProvider(
@@ -272,7 +414,9 @@ class TransportMonitor:
         """
         return {
             "count": face_count,
-            "timestamp": datetime.now().isoformat(),
+            # Epoch float: evita el formateo ISO por evento; quien
+            # consuma el evento lo formatea una sola vez si lo necesita
+            "timestamp": time.time(),
             "device_id": "transport_monitor_001",  # TODO: Hacer configurable
             "location": {
                 "lat": None,  # TODO: Integrar GPS
@@ -284,17 +428,24 @@ class TransportMonitor:
     def run(self) -> None:
         """
         Ejecuta el ciclo principal de monitoreo.
-        
-        El bucle principal:
+
+        El bucle principal actúa como productor:
         1. Lee frame del stream
         2. Verifica movimiento
-        3. Si hay movimiento, detecta rostros
-        4. Si hay rostros, guarda evento
-        5. Duerme brevemente para controlar CPU
+        3. Si hay movimiento, encola el frame para el worker
+        4. Duerme hasta el próximo deadline de camera.target_fps
+
+        El worker (_process_worker) consume los frames encolados y corre
+        la detección de rostros, el tracking y el guardado de eventos:
+        la cadencia de captura queda desacoplada de la latencia de las
+        llamadas a Rekognition.
         """
         self.running = True
-        self.stats["start_time"] = datetime.now().isoformat()
-        loop_delay = self.config.get("system", {}).get("loop_delay", 0.1)
+        self.stats.start_time = datetime.now().isoformat()
+        target_fps = self.config.get("camera", {}).get("target_fps", 5)
+        period = 1.0 / max(target_fps, 1)
+        motion_every_n = max(1, int(self.config.get("motion", {}).get("skip_motion_every_n", 1)))
+        last_motion = False
         
         self.logger.info("=" * 50)
         self.logger.info("TRANSPORT MONITOR - INICIANDO")
@@ -312,119 +463,330 @@ class TransportMonitor:
             return
         
         self.logger.info("Stream de video activo, iniciando bucle principal...")
-        
+
+        # Iniciar el worker de procesamiento
+        self._worker = threading.Thread(target=self._process_worker, daemon=True)
+        self._worker.start()
+
+        # Lookups invariantes del bucle hoisteados a locales: cada
+        # LOAD_FAST reemplaza una cadena de LOAD_ATTR por iteración
+        video_read = self.video_stream.read
+        wait_for_frame = self.video_stream.wait_for_frame
+        stream_running = self.video_stream.is_running
+        motion_detect = self.motion_detector.detect
+        get_motion_bbox = self.motion_detector.get_motion_bbox
+        put_nowait = self.work_q.put_nowait
+        copy_to_ring = self._copy_to_ring
+        stats = self.stats
+        stats_lock = self._stats_lock
+        logger = self.logger
+        flush_seconds = self.EVENT_FLUSH_SECONDS
+        monotonic = time.monotonic
+        sleep = time.sleep
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
+        next_tick = monotonic() + period
+
         try:
             while self.running:
                 # 1. Leer frame
-                frame = self.video_stream.read()
-                
+                frame = video_read()
+
                 if frame is None:
-                    time.sleep(0.01)
-                    continue
-                
-                self.stats["frames_processed"] += 1
-                
-                # 2. Verificar movimiento
-                motion_detected = self.motion_detector.detect(frame)
-                
-                if not motion_detected:
-                    time.sleep(loop_delay)
-                    continue
-                
-                self.stats["motion_detected_count"] += 1
-                self.logger.debug("Movimiento detectado, analizando rostros...")
-                
-                # 3. Detectar rostros
-                faces = self.face_counter.count_faces(frame)
-                face_count = len(faces)
-                
-                if face_count == 0:
-                    time.sleep(loop_delay)
+                    # Si el thread de captura murió (lectura fallida y
+                    # reconexión agotada), su señal terminal queda
+                    # puesta sin frame en el slot: esperar sobre ella
+                    # sería un spin caliente. Salir con error
+                    if not stream_running():
+                        logger.error(
+                            "El stream de video terminó y no hay frames; "
+                            "deteniendo el monitor"
+                        )
+                        self.running = False
+                        break
+                    # Esperar la señal del thread de captura en vez de
+                    # sondear con un sleep ciego
+                    wait_for_frame(timeout=0.1)
                     continue
-                
-                self.stats["faces_detected_total"] += face_count
-                self.logger.debug(f"Rostros detectados en frame: {face_count}")
-                
-                # 4. Filtrar pasajeros duplicados (si tracking está habilitado)
-                new_passengers = []
-                if self.tracking_enabled and self.face_tracker:
-                    for face in faces:
-                        try:
-                            # Extraer imagen del rostro
-                            face_image = extract_face_image(frame, face.bounding_box)
-                            
-                            # Verificar si es nuevo pasajero
-                            # Retorna: (is_new, face_id, is_excluded)
-                            is_new, face_id, is_excluded = self.face_tracker.is_new_passenger(face_image)
-                            
-                            if is_excluded:
-                                # Personal autorizado (operador, conductor)
-                                self.stats["excluded_detected"] += 1
-                                self.logger.debug("Personal autorizado detectado, ignorando")
-                            elif is_new:
-                                new_passengers.append(face)
-                                self.stats["new_passengers"] += 1
-                            else:
-                                self.stats["duplicate_passengers"] += 1
-                                self.logger.debug(f"Pasajero duplicado detectado: {face_id}")
-                        except Exception as e:
-                            self.logger.warning(f"Error procesando rostro para tracking: {e}")
-                            # Si hay error, considerar como nuevo pasajero
-                            new_passengers.append(face)
+
+                with stats_lock:
+                    stats.frames_processed += 1
+                    frames_processed = stats.frames_processed
+
+                # 2. Verificar movimiento (el detector ya trabaja sobre una
+                # versión decimada del frame; con skip_motion_every_n > 1
+                # los frames intermedios reusan el último resultado)
+                if motion_every_n > 1 and frames_processed % motion_every_n != 0:
+                    motion_detected = last_motion
                 else:
-                    # Sin tracking, todos los rostros son nuevos pasajeros
-                    new_passengers = faces
-                    self.stats["new_passengers"] += len(faces)
-                
-                if len(new_passengers) == 0:
-                    self.logger.debug("Sin nuevos pasajeros en este frame")
-                    time.sleep(loop_delay)
-                    continue
-                
-                self.logger.info(f"Nuevos pasajeros: {len(new_passengers)} (de {face_count} rostros)")
-                
-                # 5. Registrar eventos de abordaje con geolocalización
-                if self.location_enabled and hasattr(self, 'passenger_store'):
-                    location = self.location_provider.get_location()
-                    for face in new_passengers:
-                        # Get face_id if available from tracking
-                        passenger_face_id = None
-                        if self.tracking_enabled and self.face_tracker:
-                            try:
-                                face_img = extract_face_image(frame, face.bounding_box)
-                                _, passenger_face_id, _ = self.face_tracker.is_new_passenger(face_img)
-                            except:
-                                pass
-                        
-                        self.passenger_store.record_boarding(
-                            face_id=passenger_face_id,
-                            latitude=location.latitude,
-                            longitude=location.longitude,
-                            location_source=location.source,
-                            location_accuracy=location.accuracy
-                        )
-                
-                # 6. Guardar evento solo para nuevos pasajeros
-                event_data = self._create_face_event(len(new_passengers))
-                event_id = self.local_buffer.save_event("face_count", event_data)
-                self.stats["events_saved"] += 1
-                
-                self.logger.debug(f"Evento guardado: id={event_id}, nuevos_pasajeros={len(new_passengers)}")
-                
-                # 5. Dormir para controlar CPU
-                time.sleep(loop_delay)
-                
+                    motion_detected = motion_detect(frame)
+                    last_motion = motion_detected
+
+                # 3. Encolar el frame para el worker (copiado a un slot
+                # del anillo: el stream reusa su buffer y el handoff no
+                # asigna memoria por frame)
+                if motion_detected:
+                    with stats_lock:
+                        stats.motion_detected_count += 1
+                    if debug_enabled:
+                        logger.debug("Movimiento detectado, encolando frame...")
+                    try:
+                        put_nowait((copy_to_ring(frame), get_motion_bbox()))
+                    except queue.Full:
+                        # Backpressure: descartar el frame para privilegiar
+                        # frescura sobre backlog. El detector de movimiento
+                        # ya corrió sobre este frame, así que su historia
+                        # temporal no pierde continuidad
+                        with stats_lock:
+                            stats.dropped_frames += 1
+                        if debug_enabled:
+                            logger.debug("Cola de procesamiento llena, frame descartado")
+
+                # Flush por tiempo: un lote chico no debe quedar retenido
+                # esperando a que lleguen más eventos
+                if (self._event_batch
+                        and monotonic() - self._last_flush > flush_seconds):
+                    self._flush_events()
+
+                # 4. Pacer por deadline: dormir solo lo que resta del
+                # período de target_fps, en vez de un delay fijo que se
+                # suma al tiempo de trabajo de la iteración
+                sleep_for = next_tick - monotonic()
+                if sleep_for > 0:
+                    sleep(sleep_for)
+                    next_tick += period
+                else:
+                    # La iteración consumió todo el presupuesto: reanclar
+                    # el deadline para no acumular atraso
+                    next_tick = monotonic() + period
+
                 # Log periódico de estadísticas
-                if self.stats["frames_processed"] % 100 == 0:
+                if frames_processed % 100 == 0:
                     self._log_stats()
-                    
+
         except Exception as e:
             self.logger.error(f"Error en bucle principal: {e}", exc_info=True)
         finally:
             self._shutdown()
+
+    def _copy_to_ring(self, frame):
+        """
+        Copia el frame a un slot del anillo pre-asignado.
+
+        Un frame.copy() por handoff asigna ~2.7 MB a 1280x720; con el
+        anillo la copia escribe sobre buffers reutilizados y el camino
+        de captura no toca el allocator.
+
+        Args:
+            frame: Frame BGR a copiar
+
+        Returns:
+            Slot del anillo con el contenido del frame
+        """
+        import numpy as np
+
+        ring = self._frame_ring
+        if not ring or ring[0].shape != frame.shape:
+            ring = [np.empty_like(frame) for _ in range(self.FRAME_RING_SLOTS)]
+            self._frame_ring = ring
+            self._frame_ring_idx = 0
+
+        dst = ring[self._frame_ring_idx]
+        self._frame_ring_idx = (self._frame_ring_idx + 1) % len(ring)
+        np.copyto(dst, frame)
+        return dst
+
+    def _process_worker(self) -> None:
+        """
+        Consume frames encolados y corre el procesamiento pesado.
+
+        Corre en un thread daemon: mientras una llamada a Rekognition
+        está en vuelo, el bucle principal sigue capturando y detectando
+        movimiento sin bloquearse.
+        """
+        while True:
+            try:
+                item = self.work_q.get(timeout=0.5)
+            except queue.Empty:
+                if not self.running:
+                    break
+                continue
+
+            if item is None:  # Centinela de apagado
+                break
+
+            frame, motion_bbox = item
+            try:
+                self._process_frame(frame, motion_bbox)
+            except Exception as e:
+                self.logger.error(f"Error procesando frame: {e}", exc_info=True)
+            finally:
+                self.work_q.task_done()
+
+    def _process_frame(self, frame, motion_bbox=None) -> None:
+        """
+        Procesa un frame con movimiento: rostros, tracking y eventos.
+
+        Args:
+            frame: Frame BGR encolado por el bucle principal
+            motion_bbox: Caja (x, y, w, h) del movimiento detectado, o
+                None para analizar el frame completo
+        """
+        # 1. Detectar rostros solo en la región con movimiento: menos
+        # bytes hacia Rekognition y menor latencia de subida. El margen
+        # cubre rostros que sobresalen de la zona de cambio
+        roi_x = roi_y = 0
+        roi = frame
+        if motion_bbox is not None:
+            x, y, w, h = motion_bbox
+            height, width = frame.shape[:2]
+            margin_x = max(int(w * 0.25), 32)
+            margin_y = max(int(h * 0.25), 32)
+            x1 = max(0, x - margin_x)
+            y1 = max(0, y - margin_y)
+            x2 = min(width, x + w + margin_x)
+            y2 = min(height, y + h + margin_y)
+            # Regiones degeneradas (máscara casi vacía) no valen el
+            # recorte: analizar el frame completo
+            if x2 - x1 >= 64 and y2 - y1 >= 64:
+                roi = frame[y1:y2, x1:x2]
+                roi_x, roi_y = x1, y1
+
+        faces = self.face_counter.count_faces(roi)
+        face_count = len(faces)
+
+        # Reexpresar las cajas en coordenadas del frame completo para
+        # que extract_face_image recorte del frame original
+        if roi_x or roi_y:
+            for face in faces:
+                face.bounding_box.x += roi_x
+                face.bounding_box.y += roi_y
+
+        if face_count == 0:
+            return
+
+        self.logger.debug("Rostros detectados en frame: %s", face_count)
+
+        # 2. Filtrar pasajeros duplicados (rama especializada en
+        # _init_components según tracking_enabled)
+        new_passengers, new_face_ids, duplicates, excluded = self._process_faces(frame, faces)
+
+        with self._stats_lock:
+            self.stats.faces_detected_total += face_count
+            self.stats.new_passengers += len(new_passengers)
+            self.stats.duplicate_passengers += duplicates
+            self.stats.excluded_detected += excluded
+
+        if len(new_passengers) == 0:
+            self.logger.debug("Sin nuevos pasajeros en este frame")
+            return
+
+        self.logger.info("Nuevos pasajeros: %s (de %s rostros)",
+                         len(new_passengers), face_count)
+
+        # 3. Registrar eventos de abordaje con geolocalización
+        if self.location_enabled and hasattr(self, 'passenger_store'):
+            location = self.location_provider.get_location()
+            # Reusar los face_id que ya resolvió el lote de tracking
+            self.passenger_store.record_boardings([
+                {
+                    "face_id": face_id,
+                    "latitude": location.latitude,
+                    "longitude": location.longitude,
+                    "location_source": location.source,
+                    "location_accuracy": location.accuracy
+                }
+                for face_id in new_face_ids
+            ])
+
+        # 4. Acumular evento solo para nuevos pasajeros (se persiste
+        # por lotes en _flush_events)
+        event_data = self._create_face_event(len(new_passengers))
+        with self._batch_lock:
+            self._event_batch.append(("face_count", event_data))
+            batch_size = len(self._event_batch)
+        with self._stats_lock:
+            self.stats.events_saved += 1
+
+        self.logger.debug("Evento en lote (%s), nuevos_pasajeros=%s",
+                          batch_size, len(new_passengers))
+
+        if (batch_size >= self.EVENT_BATCH_SIZE
+                or time.monotonic() - self._last_flush > self.EVENT_FLUSH_SECONDS):
+            self._flush_events()
+
+    def _process_faces_tracking(self, frame, faces) -> tuple:
+        """
+        Resuelve los rostros contra el tracker y separa los nuevos.
+
+        Args:
+            frame: Frame BGR completo
+            faces: Rostros detectados (coordenadas de frame completo)
+
+        Returns:
+            Tupla (new_passengers, new_face_ids, duplicates, excluded)
+        """
+        # Tras la primera llamada estos imports son lookups en
+        # sys.modules; mantenerlos acá evita pagar cv2 al arrancar
+        import cv2
+        from stream_count_faces import extract_face_image
+
+        # Extraer todos los recortes y resolverlos en un solo lote:
+        # las búsquedas en Rekognition se solapan en vez de pagarse en
+        # serie rostro por rostro. Cada recorte se codifica a JPEG una
+        # sola vez acá: el tracker reusa los mismos bytes para la
+        # búsqueda y para el cache offline
+        crops = []
+        for face in faces:
+            crop = extract_face_image(frame, face.bounding_box)
+            ok, jpg = cv2.imencode(".jpg", crop, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            crops.append(jpg.tobytes() if ok else crop)
+        try:
+            results = self.face_tracker.is_new_passenger_batch(crops)
+        except Exception as e:
+            self.logger.warning(f"Error procesando rostros para tracking: {e}")
+            # Si hay error, considerar todos como nuevos pasajeros
+            results = [(True, None, False)] * len(faces)
+
+        return _classify_faces(faces, results, self.logger)
+
+    def _process_faces_passthrough(self, frame, faces) -> tuple:
+        """
+        Sin tracking: todos los rostros cuentan como pasajeros nuevos.
+
+        Args:
+            frame: Frame BGR completo (no se usa; firma compartida)
+            faces: Rostros detectados
+
+        Returns:
+            Tupla (new_passengers, new_face_ids, duplicates, excluded)
+        """
+        return faces, [None] * len(faces), 0, 0
+
+    def _flush_events(self) -> None:
+        """
+        Persiste el lote de eventos acumulado en una sola transacción.
+
+        save_events_bulk usa executemany con un solo BEGIN/COMMIT, así
+        que el fsync se paga una vez por lote en vez de por evento.
+        """
+        with self._batch_lock:
+            batch, self._event_batch = self._event_batch, []
+            self._last_flush = time.monotonic()
+
+        if not batch:
+            return
+
+        self.local_buffer.save_events_bulk(batch)
+        self.logger.debug("Lote de eventos persistido: %s", len(batch))
     
     def _log_stats(self) -> None:
         """Registra estadísticas actuales."""
+        # Con el nivel por encima de INFO, ni las consultas de stats ni
+        # el formateo valen la pena
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+
         buffer_stats = self.local_buffer.get_stats()
         tracking_info = ""
         if self.tracking_enabled and self.face_tracker:
@@ -432,19 +794,37 @@ class TransportMonitor:
             tracking_info = f", tracked={tracker_stats['tracked_faces']}, dup_rate={tracker_stats['duplicate_rate']:.1f}%"
         
         self.logger.info(
-            f"Stats: frames={self.stats['frames_processed']}, "
-            f"motion={self.stats['motion_detected_count']}, "
-            f"faces={self.stats['faces_detected_total']}, "
-            f"new={self.stats['new_passengers']}, "
-            f"dup={self.stats['duplicate_passengers']}, "
-            f"events={self.stats['events_saved']}, "
+            f"Stats: frames={self.stats.frames_processed}, "
+            f"motion={self.stats.motion_detected_count}, "
+            f"faces={self.stats.faces_detected_total}, "
+            f"new={self.stats.new_passengers}, "
+            f"dup={self.stats.duplicate_passengers}, "
+            f"events={self.stats.events_saved}, "
+            f"dropped={self.stats.dropped_frames}, "
             f"pending={buffer_stats['pending_events']}{tracking_info}"
         )
     
     def _shutdown(self) -> None:
         """Realiza el apagado limpio del sistema."""
         self.logger.info("Iniciando apagado del sistema...")
-        
+
+        # Detener el worker de procesamiento (centinela + join)
+        if self._worker is not None and self._worker.is_alive():
+            try:
+                self.work_q.put_nowait(None)
+            except queue.Full:
+                pass
+            self._worker.join(timeout=5.0)
+
+        # Persistir los eventos que quedaron en el lote
+        self._flush_events()
+
+        # Cerrar el tracker: despierta al writer debounced y drena los
+        # rostros pendientes del cache offline (justo los que no
+        # llegaron a Rekognition) antes de que muera el proceso
+        if self.tracking_enabled and self.face_tracker:
+            self.face_tracker.close()
+
         # Detener stream de video
         self.video_stream.stop()
         
@@ -466,7 +846,7 @@ class TransportMonitor:
             Diccionario con todas las estadísticas
         """
         stats = {
-            "monitor": self.stats,
+            "monitor": self.stats.as_dict(),
             "video_stream": self.video_stream.get_stats(),
             "motion_detector": self.motion_detector.get_stats(),
             "face_counter": self.face_counter.get_stats(),
@@ -552,12 +932,9 @@ def main() -> int:
     config = get_default_config()
     file_config = load_config(args.config)
     
-    # Merge de configuraciones (archivo sobrescribe defaults)
-    for key, value in file_config.items():
-        if isinstance(value, dict) and key in config:
-            config[key].update(value)
-        else:
-            config[key] = value
+    # Merge de configuraciones (archivo sobrescribe defaults,
+    # recursivo para no perder sub-claves por defecto)
+    deep_merge(config, file_config)
     
     # Aplicar argumentos de línea de comandos (sobrescriben config)
     if args.source is not None: